@@ -1,14 +1,19 @@
 import os
 import time
+import asyncio
 from typing import List, Optional
 from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
 from src.config import settings
 from src.database import db
 from src.rag_engine import rag_service
-from src.expert_model import expert_model
 from src.agent import agent_executor
+from src.services.loop_monitor import loop_monitor
+from src.services.inference_executor import inference_executor
+from src.services.model_manager import model_manager
+from src.services.model_registry import model_registry
 
 # 1. Load Config (Handled by settings)
 ZAP_URL = settings.ZAP_URL
@@ -23,9 +28,23 @@ async def lifespan(app: FastAPI):
         print(f"❌ Failed to connect to MongoDB: {e}")
     
     await rag_service.initialize()
-    # expert_model.load_model() # Optional: Preload model on startup
+    loop_monitor.start()
+    model_manager.start()
+    model_registry.start()
+
+    # Optional: Preload + warm up models in the background (/ready turns 200 when hot)
+    warmup_task = None
+    if settings.PRELOAD_MODELS:
+        warmup_task = asyncio.create_task(inference_executor.run(model_registry.active_model.warm_up))
     yield
     # Shutdown
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    from src.services.micro_batcher import verify_batcher
+    await verify_batcher.stop()
+    await loop_monitor.stop()
+    await model_manager.stop()
+    inference_executor.shutdown()
     await db.close()
 
 app = FastAPI(title="RedEye: AI Security Agent", version="2.0.0", lifespan=lifespan)
@@ -41,13 +60,44 @@ async def get_model_metrics():
     from src.services.training_metrics import training_metrics_service
     return training_metrics_service.get_metrics()
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe ("can serve"). With PRELOAD_MODELS, returns 503 until both models
+    have been loaded and warmed up once; models the memory governor unloads afterwards
+    reload lazily and do not make the pod unready. Without it, models load lazily and
+    the service is ready immediately.
+    Includes per-model cold-start times of the active registry version.
+    """
+    status = model_registry.active_model.readiness()
+    status["ready"] = status["warmed_up"] or not settings.PRELOAD_MODELS
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/metrics/event-loop")
+async def get_event_loop_metrics():
+    """
+    Event-loop lag (how late a periodic probe wakes up). Should stay within a few ms;
+    higher values mean blocking work is running on the loop.
+    """
+    return loop_monitor.stats()
+
+@app.get("/metrics/models")
+async def get_model_memory_metrics():
+    """
+    Model memory governor: resident MB per loaded model, idle time, budget,
+    process RSS and recent load / unload / memory-pressure events.
+    """
+    return model_manager.stats()
+
 # Include Routers
 # Include Routers
 from src.auth.github import router as auth_router
 from src.api.analysis import router as analysis_router
+from src.api.models import router as models_router
 
 app.include_router(auth_router)
 app.include_router(analysis_router)
+app.include_router(models_router)
 
 # Add CORS Middleware
 app.add_middleware(
@@ -0,0 +1,104 @@
+"""
+ONNX Runtime 백엔드 vs PyTorch eager 백엔드: 지연시간 / 정확도 동등성 벤치마크
+
+CIRCL repair 데이터셋(data/circl_processed/repair.jsonl) 샘플로 두 백엔드를 비교합니다.
+- 탐지: 호출당 지연시간 (p50/p95), 라벨 일치율, 최대 confidence 차이
+- 수정: 호출당 지연시간 (p50/p95), 두 백엔드 출력 완전 일치율,
+        데이터셋 정답(output) 대비 exact match 비율
+
+사전 준비: python scripts/export_onnx.py
+사용법:
+    python scripts/bench_onnx_parity.py [--samples 50] [--skip-repair]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.expert_model import ExpertModel
+
+DATA_PATH = "./data/circl_processed/repair.jsonl"
+PREFIX = "fix vulnerability: "
+
+
+def load_samples(num_samples):
+    samples = []
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            samples.append((row["input"].replace(PREFIX, "", 1), row["output"]))
+            if len(samples) >= num_samples:
+                break
+    return samples
+
+
+def timed(fn, inputs):
+    outputs, latencies = [], []
+    for item in inputs:
+        start = time.perf_counter()
+        outputs.append(fn(item))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return outputs, latencies
+
+
+def describe(latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return f"p50={statistics.median(ordered):7.1f}ms  p95={p95:7.1f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--skip-repair", action="store_true")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    codes = [code for code, _ in samples]
+    backends = {"torch": ExpertModel(backend="torch"), "onnx": ExpertModel(backend="onnx")}
+
+    # --- Detection ---
+    print(f"\n🔍 Detection ({len(codes)} samples)")
+    detections = {}
+    for name, model in backends.items():
+        model.cache = None  # Measure the backends, not the result cache
+        model.load_detection_model()
+        if model.detect_model is None:
+            print(f"❌ [{name}] {model.load_error}")
+            return
+        model.verify(codes[0])  # Warm-up
+        detections[name], latencies = timed(model.verify, codes)
+        print(f"⚙️ {name:<6} {describe(latencies)}")
+
+    agree = sum(a["label"] == b["label"] for a, b in zip(detections["torch"], detections["onnx"])) / len(codes)
+    delta = max(abs(a["confidence"] - b["confidence"]) for a, b in zip(detections["torch"], detections["onnx"]))
+    print(f"📊 label_agreement={agree:.3f}  max_conf_delta={delta:.4f}")
+
+    if args.skip_repair:
+        return
+
+    # --- Repair ---
+    print(f"\n🛠️ Repair ({len(codes)} samples)")
+    repairs = {}
+    for name, model in backends.items():
+        model.load_repair_model()
+        if model.repair_model is None:
+            print(f"❌ [{name}] {model.load_error}")
+            return
+        model.repair(codes[0])  # Warm-up
+        outputs, latencies = timed(model.repair, codes)
+        repairs[name] = [out.get("fixed_code", "") for out in outputs]
+        exact = sum(fix.strip() == target.strip() for fix, (_, target) in zip(repairs[name], samples)) / len(samples)
+        print(f"⚙️ {name:<6} {describe(latencies)}  exact_match_vs_target={exact:.3f}")
+
+    same = sum(a == b for a, b in zip(repairs["torch"], repairs["onnx"])) / len(codes)
+    print(f"📊 identical_outputs={same:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Pre-fork 서빙 벤치마크: 워커 수별 처리량 / 워커당 메모리
+
+워커 수(1, 2, 4)마다 `python -m src.prefork` 서버를 띄우고 /analyze/code 에
+동시 요청을 보내 처리량(req/s)과 지연시간(p50/p95)을 측정합니다.
+요청마다 코드 내용을 바꿔 추론 결과 캐시 / single-flight 를 우회합니다.
+측정 후 각 워커의 RSS / PSS / USS 를 출력합니다.
+(모델 가중치는 부모 프로세스에서 로드되어 copy-on-write 로 공유되므로 USS 는 RSS 보다 훨씬 작아야 함)
+
+사용법:
+    python scripts/bench_prefork.py [--workers 1,2,4] [--concurrency 16] [--duration 20] [--port 8765]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+
+from src.services.model_manager import process_memory
+
+SNIPPET = "def handler(request):\n    query = request.args['q']\n    return db.execute('SELECT * FROM t WHERE id = ' + query)  # {n}"
+STARTUP_TIMEOUT = 300
+
+
+async def wait_until_up(base_url):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base_url}/ready") as response:
+                    if response.status == 200:
+                        return True
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(1)
+    return False
+
+
+async def load_test(base_url, concurrency, duration):
+    latencies, errors = [], 0
+    counter = 0
+    stop_at = time.monotonic() + duration
+
+    async def client(session):
+        nonlocal counter, errors
+        while time.monotonic() < stop_at:
+            counter += 1
+            payload = {"code": SNIPPET.format(n=counter), "filename": "bench.py"}
+            start = time.perf_counter()
+            try:
+                async with session.post(f"{base_url}/analyze/code", json=payload) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                        continue
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        await asyncio.gather(*[client(session) for _ in range(concurrency)])
+    return latencies, errors
+
+
+def worker_pids(parent_pid):
+    try:
+        with open(f"/proc/{parent_pid}/task/{parent_pid}/children") as f:
+            return [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+
+
+def run(workers, args):
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "src.prefork", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(args.port)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    try:
+        if not asyncio.run(wait_until_up(base_url)):
+            print(f"❌ workers={workers}: server did not come up")
+            return
+        asyncio.run(load_test(base_url, args.concurrency, 3))  # Warm-up (each worker's first requests)
+        latencies, errors = asyncio.run(load_test(base_url, args.concurrency, args.duration))
+        if not latencies:
+            print(f"❌ workers={workers}: all {errors} requests failed")
+            return
+
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        print(
+            f"⚙️ workers={workers}  {len(latencies) / args.duration:7.1f} req/s  "
+            f"p50={statistics.median(ordered):7.1f}ms  p95={p95:7.1f}ms  errors={errors}"
+        )
+        memory = [process_memory(pid) for pid in worker_pids(server.pid)]
+        memory = [m for m in memory if m]
+        if memory:
+            print(
+                f"   📊 per worker: rss={statistics.mean(m['rss'] for m in memory) / 1e6:7.1f} MB  "
+                f"pss={statistics.mean(m['pss'] for m in memory) / 1e6:7.1f} MB  "
+                f"uss={statistics.mean(m['uss'] for m in memory) / 1e6:7.1f} MB  "
+                f"(total pss={sum(m['pss'] for m in memory) / 1e6:7.1f} MB)"
+            )
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=str, default="1,2,4")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        run(workers, args)
+
+
+if __name__ == "__main__":
+    main()
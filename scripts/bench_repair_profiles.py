@@ -0,0 +1,80 @@
+"""
+수정 모델 디코딩 프로필 벤치마크: fast / balanced / speculative
+
+CIRCL repair 데이터셋(data/circl_processed/repair.jsonl) 샘플로 ExpertModel.repair 를
+프로필별로 실행해 비교합니다.
+- 호출당 지연시간 (p50/p95)과 balanced 대비 속도
+- 데이터셋 정답(output) 대비 exact match 비율
+- speculative 는 근사 greedy (동적 int8 은 다중 토큰 패스에서 활성값 scale 이 달라짐) 이므로
+  fast 출력과의 일치율도 출력
+
+사용법:
+    python scripts/bench_repair_profiles.py [--samples 50] [--profiles fast,balanced,speculative]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.expert_model import REPAIR_PROFILES, expert_model
+
+DATA_PATH = "./data/circl_processed/repair.jsonl"
+PREFIX = "fix vulnerability: "
+
+
+def load_samples(num_samples):
+    samples = []
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            samples.append((row["input"].replace(PREFIX, "", 1), row["output"]))
+            if len(samples) >= num_samples:
+                break
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--profiles", type=str, default=",".join(REPAIR_PROFILES))
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    expert_model.cache = None  # Measure decoding, not the result cache
+    expert_model.load_repair_model()
+    if expert_model.repair_model is None:
+        print(f"❌ Model load failed: {expert_model.load_error}")
+        return
+    print(f"🛠️ Repair profiles on {len(samples)} samples ({expert_model.backend} backend)")
+
+    outputs, rows = {}, {}
+    for profile in args.profiles.split(","):
+        expert_model.repair(samples[0][0], profile=profile)  # Warm-up
+        fixes, latencies = [], []
+        for code, _ in samples:
+            start = time.perf_counter()
+            fixes.append(expert_model.repair(code, profile=profile).get("fixed_code", ""))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        exact = sum(fix.strip() == target.strip() for fix, (_, target) in zip(fixes, samples)) / len(samples)
+        outputs[profile] = fixes
+        rows[profile] = (statistics.median(ordered), p95, exact)
+
+    for profile, (p50, p95, exact) in rows.items():
+        speedup = f"  speedup_vs_balanced={rows['balanced'][0] / p50:4.1f}x" if "balanced" in rows else ""
+        print(f"⚙️ {profile:<12} p50={p50:7.1f}ms  p95={p95:7.1f}ms  exact_match_vs_target={exact:.3f}{speedup}")
+
+    if "fast" in outputs and "speculative" in outputs:
+        same = sum(a == b for a, b in zip(outputs["fast"], outputs["speculative"])) / len(samples)
+        print(f"📊 speculative_agreement_with_fast={same:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+SAST 엔진 벤치마크: 기존 라인 x 룰 re.search 루프 vs 컴파일된 RuleEngine
+
+CIRCL repair 데이터셋의 코드 스니펫을 이어 붙여 대형 파일 코퍼스를 만들고,
+두 방식의 처리량(MB/s)을 비교하며 결과(alert)가 동일한지 검증합니다.
+
+사용법:
+    python scripts/bench_sast_engine.py [--files 200] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.repo_scanner import RepoScanner
+
+DATA_PATH = "./data/circl_processed/repair.jsonl"
+SNIPPETS_PER_FILE = 100
+
+
+def legacy_scan_content(patterns, content, filename="snippet"):
+    """Baseline: the original per-line, per-rule `re.search` loop."""
+    alerts = []
+    lines = content.split('\n')
+    for i, line in enumerate(lines):
+        for vuln in patterns:
+            if re.search(vuln["pattern"], line):
+                start_line = max(0, i - 2)
+                end_line = min(len(lines), i + 3)
+                context_snippet = "\n".join(lines[start_line:end_line])
+                alerts.append({
+                    "alert": vuln["label"],
+                    "risk": vuln["risk"],
+                    "description": vuln["description"],
+                    "other": f"File: {filename}:{i+1}\nCode:\n{context_snippet}"[:500]
+                })
+    return alerts
+
+
+def build_corpus(num_files):
+    snippets = []
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            code = json.loads(line)["input"]
+            snippets.append(code.replace("fix vulnerability: ", "", 1))
+            if len(snippets) >= num_files * SNIPPETS_PER_FILE:
+                break
+
+    return [
+        "\n".join(snippets[i:i + SNIPPETS_PER_FILE])
+        for i in range(0, len(snippets), SNIPPETS_PER_FILE)
+    ]
+
+
+def timed(fn, files, repeat):
+    best = float("inf")
+    alerts = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        alerts = [fn(content, f"file_{i}") for i, content in enumerate(files)]
+        best = min(best, time.perf_counter() - start)
+    return best, alerts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    files = build_corpus(args.files)
+    total_mb = sum(len(c) for c in files) / 1e6
+    total_lines = sum(c.count("\n") + 1 for c in files)
+    print(f"📦 Corpus: {len(files)} files, {total_lines} lines, {total_mb:.2f} MB")
+
+    scanner = RepoScanner()
+    patterns = scanner.vulnerability_patterns
+
+    legacy_time, legacy_alerts = timed(lambda c, n: legacy_scan_content(patterns, c, n), files, args.repeat)
+    engine_time, engine_alerts = timed(scanner.scan_content, files, args.repeat)
+
+    print(f"🐢 Legacy  : {legacy_time:.3f}s ({total_mb / legacy_time:.2f} MB/s)")
+    print(f"🚀 Engine  : {engine_time:.3f}s ({total_mb / engine_time:.2f} MB/s)")
+    print(f"⚡ Speedup : {legacy_time / engine_time:.1f}x")
+    print(f"✅ Parity  : {legacy_alerts == engine_alerts} ({sum(len(a) for a in engine_alerts)} alerts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+SAST 병렬 스캔 벤치마크: RepoScanner.scan_directory 워커 수별 스케일링 측정
+
+CIRCL repair 데이터셋 스니펫으로 합성 레포(기본 50,000 파일)를 임시 디렉토리에 생성한 뒤,
+워커 수(1, 2, 4, ... CPU 코어 수)별 처리 시간과 files/s 를 비교하고
+모든 워커 수에서 결과(alert 순서 포함)가 동일한지 검증합니다.
+
+사용법:
+    python scripts/bench_sast_parallel.py [--files 50000] [--workers 1,2,4,8]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.repo_scanner import RepoScanner
+
+DATA_PATH = "./data/circl_processed/repair.jsonl"
+FILES_PER_DIR = 500
+EXTENSIONS = [".py", ".js", ".java", ".go", ".c", ".php"]
+
+
+def build_repo(root, num_files):
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        snippets = [json.loads(line)["input"].replace("fix vulnerability: ", "", 1) for line in f]
+
+    for i in range(num_files):
+        directory = os.path.join(root, f"pkg_{i // FILES_PER_DIR:03d}")
+        os.makedirs(directory, exist_ok=True)
+        # ~5 snippets per file, rotating through the dataset
+        content = "\n".join(snippets[(i * 5 + k) % len(snippets)] for k in range(5))
+        with open(os.path.join(directory, f"module_{i}{EXTENSIONS[i % len(EXTENSIONS)]}"), "w", encoding="utf-8") as out:
+            out.write(content)
+
+
+def main():
+    cpu = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    default_workers = sorted({1, 2, 4, 8, cpu} & set(range(1, cpu + 1)))
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--workers", type=str, default=",".join(map(str, default_workers)))
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="redeye-bench-")
+    try:
+        print(f"📦 Building synthetic repo with {args.files} files in {root}...")
+        build_repo(root, args.files)
+
+        scanner = RepoScanner()
+        baseline = None
+        baseline_time = None
+        for workers in (int(w) for w in args.workers.split(",")):
+            start = time.perf_counter()
+            alerts = scanner.scan_directory(root, workers=workers)
+            elapsed = time.perf_counter() - start
+
+            if baseline is None:
+                baseline, baseline_time = alerts, elapsed
+            print(
+                f"⚙️ workers={workers:<3} {elapsed:7.2f}s  {args.files / elapsed:9.0f} files/s  "
+                f"speedup={baseline_time / elapsed:4.1f}x  alerts={len(alerts)}  "
+                f"identical={alerts == baseline}"
+            )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
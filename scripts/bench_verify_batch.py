@@ -0,0 +1,74 @@
+"""
+탐지 모델 배치 추론 벤치마크: ExpertModel.verify_batch 배치 크기별 CPU 처리량 측정
+
+CIRCL repair 데이터셋 스니펫으로 (양자화된) CodeBERT 탐지 모델을 배치 크기
+(1, 4, 8, 16, 32)별로 실행해 처리 시간과 snippets/s 를 비교합니다.
+배치 크기 1 (기존 verify 와 동일) 결과를 기준으로 라벨 일치율과
+최대 confidence 차이도 함께 출력합니다.
+(동적 양자화는 배치 전체 기준으로 activation scale 을 잡으므로 미세한 차이가 날 수 있음)
+
+사용법:
+    python scripts/bench_verify_batch.py [--samples 256] [--batch-sizes 1,4,8,16,32] [--threads 4]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+from src.expert_model import expert_model
+
+DATA_PATH = "./data/circl_processed/repair.jsonl"
+
+
+def load_snippets(num_samples):
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        snippets = [json.loads(line)["input"].replace("fix vulnerability: ", "", 1) for line in f]
+    return (snippets * (num_samples // len(snippets) + 1))[:num_samples]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=256)
+    parser.add_argument("--batch-sizes", type=str, default="1,4,8,16,32")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    print(f"🧵 torch threads: {torch.get_num_threads()}")
+
+    snippets = load_snippets(args.samples)
+    expert_model.cache = None  # Snippets repeat: measure the model, not the result cache
+    expert_model.load_detection_model()
+    if expert_model.detect_model is None:
+        print(f"❌ Model load failed: {expert_model.load_error}")
+        return
+
+    # Warm-up (first forward pass allocates / packs weights)
+    expert_model.verify_batch(snippets[:8], batch_size=8)
+
+    baseline = None
+    baseline_time = None
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        start = time.perf_counter()
+        results = expert_model.verify_batch(snippets, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+
+        if baseline is None:
+            baseline, baseline_time = results, elapsed
+        agree = sum(r["label"] == b["label"] for r, b in zip(results, baseline)) / len(results)
+        max_delta = max(abs(r["confidence"] - b["confidence"]) for r, b in zip(results, baseline))
+        print(
+            f"⚙️ batch_size={batch_size:<3} {elapsed:7.2f}s  {len(snippets) / elapsed:7.1f} snippets/s  "
+            f"speedup={baseline_time / elapsed:4.1f}x  label_agreement={agree:.3f}  max_conf_delta={max_delta:.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
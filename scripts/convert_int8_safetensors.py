@@ -0,0 +1,77 @@
+"""
+양자화 모델 변환: pytorch_model.bin (pickle) -> model.int8.safetensors (mmap 로드용)
+
+현재 서빙 경로와 동일하게 양자화 모델을 로드한 뒤, 각 Linear 레이어의 int8 가중치와
+scale / zero-point, 나머지 float 텐서를 safetensors 로 저장합니다.
+config 와 토크나이저도 함께 저장하므로 로드 시 허브 접근이 필요 없습니다.
+출력 디렉토리를 DETECTION_MODEL_PATH / REPAIR_MODEL_PATH 로 지정하거나 허브 레포에 업로드하면
+ExpertModel 이 자동으로 빠른 경로를 사용합니다.
+
+사용법:
+    python scripts/convert_int8_safetensors.py [--output ./models/int8] [--only detection|repair]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import AutoModelForSeq2SeqLM, RobertaForSequenceClassification
+
+from src.config import settings
+from src.expert_model import ExpertModel
+from src.model_artifacts import ARTIFACT_FILE, load_int8_artifact, save_int8_artifact
+
+
+def convert(name, model_class, model_path, output_dir, is_seq2seq):
+    print(f"\n🚀 [{name}] Loading legacy checkpoint from {model_path}...")
+    start = time.perf_counter()
+    model, tokenizer = ExpertModel(backend="torch")._load_quantized_model(model_class, model_path, is_seq2seq=is_seq2seq)
+    legacy_seconds = time.perf_counter() - start
+
+    save_int8_artifact(model, tokenizer, output_dir)
+    size = os.path.getsize(os.path.join(output_dir, ARTIFACT_FILE))
+
+    # Round trip: identical outputs and load time of the new format
+    start = time.perf_counter()
+    reloaded, _ = load_int8_artifact(model_class, output_dir)
+    artifact_seconds = time.perf_counter() - start
+
+    inputs = tokenizer("def f(x):\n    return eval(x)", return_tensors="pt")
+    with torch.no_grad():
+        if is_seq2seq:
+            expected = model.generate(**inputs, max_length=32)
+            actual = reloaded.generate(**inputs, max_length=32)
+            identical = torch.equal(expected, actual)
+        else:
+            identical = torch.allclose(model(**inputs).logits, reloaded(**inputs).logits)
+
+    print(
+        f"✅ [{name}] {output_dir}/{ARTIFACT_FILE} ({size / 1e6:.1f} MB)  "
+        f"load: legacy={legacy_seconds:.2f}s -> artifact={artifact_seconds:.2f}s  identical={identical}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", type=str, default="./models/int8")
+    parser.add_argument("--only", choices=["detection", "repair"], default=None)
+    args = parser.parse_args()
+
+    if args.only in (None, "detection"):
+        convert(
+            "detection", RobertaForSequenceClassification, settings.DETECTION_MODEL_PATH,
+            os.path.join(args.output, "redeye-detection"), is_seq2seq=False
+        )
+    if args.only in (None, "repair"):
+        convert(
+            "repair", AutoModelForSeq2SeqLM, settings.REPAIR_MODEL_PATH,
+            os.path.join(args.output, "redeye-repair"), is_seq2seq=True
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+탐지/수정 모델 ONNX 내보내기 (INFERENCE_BACKEND=onnx 용)
+
+1. 현재 torch 백엔드와 동일하게 양자화 모델(pytorch_model.bin)을 로드
+2. 동적 양자화된 Linear 가중치를 float32 로 역양자화해 일반 HF 체크포인트로 저장
+   (quantize_dynamic 모듈은 ONNX 로 직접 export 할 수 없음)
+3. optimum 으로 ONNX export
+   - 탐지: model.onnx
+   - 수정: encoder_model.onnx + decoder_model.onnx + decoder_with_past_model.onnx (past key values 캐시)
+4. ONNX Runtime 동적 int8 양자화 (가중치 int8, 활성값은 실행 시 양자화)
+5. 서빙 시 사용한 것과 같은 토크나이저를 함께 저장
+
+사용법 (onnx extra 필요: uv sync --extra onnx):
+    python scripts/export_onnx.py [--output ./models/onnx] [--only detection|repair]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import AutoConfig, AutoModelForSeq2SeqLM, RobertaForSequenceClassification
+from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSequenceClassification, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+from src.config import settings
+from src.expert_model import ExpertModel
+
+
+def dequantize(quantized_model, model_class, config):
+    """Dynamic-int8 torch model -> float32 model with the same (dequantized) weights."""
+    if "AutoModel" in model_class.__name__:
+        float_model = model_class.from_config(config)
+    else:
+        float_model = model_class(config)
+
+    # 1. Quantized Linear layers (packed params)
+    for name, module in quantized_model.named_modules():
+        if hasattr(module, "_packed_params"):
+            target = float_model.get_submodule(name)
+            target.weight.data.copy_(module.weight().dequantize())
+            if module.bias() is not None:
+                target.bias.data.copy_(module.bias())
+
+    # 2. Everything else (embeddings, layer norms) is already float; copied last so tied
+    #    embeddings keep their exact values
+    float_state = float_model.state_dict()
+    plain = {
+        key: value for key, value in quantized_model.state_dict().items()
+        if isinstance(value, torch.Tensor) and not value.is_quantized and key in float_state
+        and value.shape == float_state[key].shape
+    }
+    float_model.load_state_dict(plain, strict=False)
+    return float_model.eval()
+
+
+def quantize_onnx_dir(source_dir, output_dir):
+    """Dynamic int8 quantization of every .onnx file in `source_dir` (keeps the file names)."""
+    qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    os.makedirs(output_dir, exist_ok=True)
+    for file_name in sorted(os.listdir(source_dir)):
+        if not file_name.endswith(".onnx"):
+            if os.path.isfile(os.path.join(source_dir, file_name)):
+                shutil.copy(os.path.join(source_dir, file_name), output_dir)
+            continue
+        print(f"📉 Quantizing {file_name} (dynamic int8)...")
+        quantizer = ORTQuantizer.from_pretrained(source_dir, file_name=file_name)
+        quantizer.quantize(save_dir=output_dir, quantization_config=qconfig)
+        quantized_name = file_name.replace(".onnx", "_quantized.onnx")
+        os.replace(os.path.join(output_dir, quantized_name), os.path.join(output_dir, file_name))
+
+
+def export(name, model_class, ort_class, model_path, output_dir, is_seq2seq):
+    print(f"\n🚀 [{name}] Loading quantized torch model from {model_path}...")
+    expert = ExpertModel(backend="torch")
+    quantized, tokenizer = expert._load_quantized_model(model_class, model_path, is_seq2seq=is_seq2seq)
+    hf_token = settings.HF_TOKEN if settings.HF_TOKEN else None
+    config = AutoConfig.from_pretrained(model_path, token=hf_token)
+
+    work_dir = tempfile.mkdtemp(prefix=f"redeye-onnx-{name}-")
+    try:
+        float_dir = os.path.join(work_dir, "float")
+        onnx_dir = os.path.join(work_dir, "onnx")
+
+        print(f"🔁 [{name}] Dequantizing to float32...")
+        dequantize(quantized, model_class, config).save_pretrained(float_dir)
+        tokenizer.save_pretrained(float_dir)
+
+        print(f"📦 [{name}] Exporting to ONNX...")
+        export_kwargs = {"use_cache": True} if is_seq2seq else {}
+        ort_model = ort_class.from_pretrained(float_dir, export=True, **export_kwargs)
+        ort_model.save_pretrained(onnx_dir)
+        tokenizer.save_pretrained(onnx_dir)
+
+        quantize_onnx_dir(onnx_dir, output_dir)
+        tokenizer.save_pretrained(output_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    size = sum(os.path.getsize(os.path.join(output_dir, f)) for f in os.listdir(output_dir) if f.endswith(".onnx"))
+    print(f"✅ [{name}] Saved to {output_dir} ({size / 1e6:.1f} MB of ONNX graphs)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", type=str, default="./models/onnx")
+    parser.add_argument("--only", choices=["detection", "repair"], default=None)
+    args = parser.parse_args()
+
+    if args.only in (None, "detection"):
+        export(
+            "detection", RobertaForSequenceClassification, ORTModelForSequenceClassification,
+            settings.DETECTION_MODEL_PATH, os.path.join(args.output, "redeye-detection"), is_seq2seq=False
+        )
+    if args.only in (None, "repair"):
+        export(
+            "repair", AutoModelForSeq2SeqLM, ORTModelForSeq2SeqLM,
+            settings.REPAIR_MODEL_PATH, os.path.join(args.output, "redeye-repair"), is_seq2seq=True
+        )
+
+
+if __name__ == "__main__":
+    main()
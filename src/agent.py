@@ -3,12 +3,17 @@ from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain_core.tools import tool
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from src.legacy.zap_scanner import zap_scanner
-from src.expert_model import expert_model
+from src.services.model_registry import model_registry
 from src.rag_engine import rag_service
 import json
 import os
+from typing import List
 
-from src.repo_scanner import repo_scanner
+from src.repo_scanner import repo_scanner, RISK_LEVELS
+
+# Max SAST alerts returned to the agent (keeps the tool output inside the context window).
+# The highest-risk alerts are kept; dropped ones are counted per risk in "omitted".
+MAX_SCAN_ALERTS = 200
 
 # 1. Define Tools
 @tool
@@ -16,54 +21,93 @@ async def run_security_scan(target: str) -> str:
     """
     Scans a target (URL or GitHub Repo) for security vulnerabilities.
     - If target is a GitHub Repo: Uses Static Analysis (SAST) to find secrets & code issues.
-    - If target is a Web URL: Uses OWASP ZAP (DAST) to find runtime vulnerabilities.
-    Returns a list of alerts in JSON format.
+    - If target is a Web URL: Uses OWASP ZAP (DAST) to find runtime vulnerabilities (High/Medium only).
+    Returns JSON: {"alerts": [...highest risk first], "truncated": bool, "omitted": {risk: count}}.
+    Results are capped at MAX_SCAN_ALERTS, keeping High over Medium over Low; when
+    "truncated" is true, "omitted" tells how many alerts of each risk the cap left out.
+    DAST results also carry "filtered": ZAP alerts below Medium, dropped by policy (not truncation).
     """
+    # Simplify alerts to save context window
+    def simplify(a):
+        return {
+            "alert": a.get('alert'),
+            "risk": a.get('risk', 'Low'),
+            "description": a.get('description')[:200], 
+            "other": a.get('other', '')[:1000] 
+        }
+
+    # Kept alerts per risk (file order within a risk); at most MAX_SCAN_ALERTS in total
+    kept = {risk: [] for risk in sorted(RISK_LEVELS, key=RISK_LEVELS.get, reverse=True)}
+    omitted = {risk: 0 for risk in kept}
+    filtered = None
+    scan_complete = True
+
+    def keep(a):
+        """Adds an alert under the cap; False once the cap is full of High alerts."""
+        risk = a.get('risk') if a.get('risk') in kept else 'Low'
+        kept[risk].append(simplify(a))
+        if sum(len(alerts) for alerts in kept.values()) > MAX_SCAN_ALERTS:
+            # Drop the most recent alert of the lowest risk present
+            lowest = next(r for r in reversed(list(kept)) if kept[r])
+            kept[lowest].pop()
+            omitted[lowest] += 1
+        return len(kept['High']) < MAX_SCAN_ALERTS
+
     if "github.com" in target:
-        # SAST Path
+        # SAST Path: stream alerts; only the kept ones are held in memory
         print(f"🔄 Routing to Repo Scanner: {target}")
-        alerts = repo_scanner.scan_repo(target)
+        stream = repo_scanner.aiter_scan_repo(target)
+        try:
+            async for a in stream:
+                if not keep(a):
+                    scan_complete = False  # Nothing can displace High alerts: stop the scan
+                    break
+        finally:
+            await stream.aclose()
     else:
         # DAST Path
         print(f"🔄 Routing to ZAP Scanner: {target}")
         alerts = await zap_scanner.scan(target)
+        # Filter: For ZAP, only High/Medium (policy, not truncation)
+        filtered = 0
+        for a in alerts:
+            if a.get('risk', 'Low') in ['High', 'Medium']:
+                keep(a)
+            else:
+                filtered += 1
 
-    # Simplify alerts to save context window
-    simple_alerts = []
-    for a in alerts:
-        # Filter: For SAST, include all. For ZAP, only High/Medium unless empty.
-        risk = a.get('risk', 'Low')
-        if risk in ['High', 'Medium'] or "github.com" in target:
-             simple_alerts.append({
-                "alert": a.get('alert'),
-                "risk": risk,
-                "description": a.get('description')[:200], 
-                "other": a.get('other', '')[:1000] 
-            })
-            
-    return json.dumps(simple_alerts)
+    result = {
+        "alerts": [alert for risk in kept for alert in kept[risk]],
+        "truncated": any(omitted.values()) or not scan_complete,
+        "omitted": {risk: count for risk, count in omitted.items() if count}
+    }
+    if filtered is not None:
+        result["filtered"] = filtered
+    if not scan_complete:
+        result["note"] = f"Scan stopped after {MAX_SCAN_ALERTS} High-risk alerts; more may exist."
+    return json.dumps(result)
 
 @tool
-def verify_vulnerability(code_snippet: str) -> str:
+async def verify_vulnerability(code_snippet: str) -> str:
     """
     Verifies if a code snippet is truly vulnerable using a specialized AI model (Expert_Detector).
     Input: Source code string.
     Output: Prediction (SAFE or VULNERABLE) and confidence score.
     Use this to reduce false positives.
     """
-    result = expert_model.verify(code_snippet)
+    result = await model_registry.call("verify", code_snippet)
     return json.dumps(result)
 
 @tool
-def generate_local_expert_fix(vulnerable_code: str) -> str:
+async def generate_local_expert_fix(vulnerable_codes: List[str]) -> str:
     """
-    Generates a secure code fix using a specialized local Small Language Model (Repair_Model_v4).
-    Input: Vulnerable source code string.
-    Output: Secure code suggestion.
+    Generates secure code fixes using a specialized local Small Language Model (Repair_Model_v4).
+    Input: List of vulnerable source code strings. Pass ALL snippets in one call (they are batched).
+    Output: JSON list of secure code suggestions, in input order.
     Use this as a secondary 'expert opinion' to compare with your own reasoning.
     """
-    fix = expert_model.repair(vulnerable_code)
-    return fix
+    fixes = await model_registry.call("repair_batch", vulnerable_codes)
+    return json.dumps(fixes)
 
 @tool
 async def search_past_solutions(query: str) -> str:
@@ -97,7 +141,7 @@ Process:
 3. VERIFY suspected code using `verify_vulnerability` to reduce false positives.
 4. For verified vulnerabilities:
    - First, think of a secure fix yourself using your advanced knowledge.
-   - Optionally, call `generate_local_expert_fix` to get a second opinion from a specialized local model.
+   - Optionally, call `generate_local_expert_fix` once with all verified snippets to get a second opinion from a specialized local model.
    - Combine these insights to provide the best possible fix.
 5. Search for past solutions using `search_past_solutions`.
 6. Compile a final comprehensive report.
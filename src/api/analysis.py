@@ -1,9 +1,17 @@
+import json
+import asyncio
 from fastapi import APIRouter, HTTPException, Body
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Any
-from src.expert_model import expert_model
+from typing import Optional, List, Any, Literal
+from src.services.model_registry import model_registry
 from src.repo_scanner import repo_scanner
 from src.github_diff_scanner import github_diff_scanner
+from src.database import db
+from src.config import settings
+from src.services.micro_batcher import verify_batcher, BatcherOverloaded
+from src.services.inference_executor import inference_executor, InferenceOverloaded
+from src.services.single_flight import analysis_flight
 import logging
 
 router = APIRouter(prefix="/analyze", tags=["Analysis"])
@@ -18,6 +26,16 @@ class CodeAnalysisRequest(BaseModel):
 class CodeRepairRequest(BaseModel):
     code: str
     vulnerability_type: Optional[str] = "Generic Vulnerability"
+    # fast: greedy, balanced: beam search, speculative: approximately greedy with input-lookup drafts
+    # (the response's "decoding" says what ran: greedy | approximate_greedy | beam_search)
+    decoding_profile: Optional[Literal["fast", "balanced", "speculative"]] = None  # None -> settings.REPAIR_DECODING_PROFILE
+
+class RepairBatchRequest(BaseModel):
+    snippets: List[str]
+    decoding_profile: Optional[Literal["fast", "balanced", "speculative"]] = None
+
+# Upper bound on snippets per /repair/batch request
+MAX_REPAIR_BATCH = 64
 
 class PRAnalysisRequest(BaseModel):
     owner: str
@@ -25,6 +43,11 @@ class PRAnalysisRequest(BaseModel):
     pr_number: int
     max_files: Optional[int] = 50
 
+class RangeAnalysisRequest(BaseModel):
+    repo_url: str
+    base_ref: Optional[str] = None  # None -> last scanned SHA of this repo
+    head_ref: Optional[str] = "HEAD"
+
 # --- Endpoints ---
 
 @router.post("/code")
@@ -35,51 +58,69 @@ async def analyze_code(request: CodeAnalysisRequest):
     2. AI Analysis (CodeBERT via ExpertModel)
     
     Returns a combined report.
+    Identical concurrent requests share one computation (single-flight).
     """
     try:
-        results = {
-            "sast_alerts": [],
-            "ai_verification": {},
-            "is_vulnerable": False
-        }
-
-        # 1. SAST Scan (Fast Filter)
-        # We strip the code to ensure clean input
-        sast_alerts = repo_scanner.scan_content(request.code, filename=request.filename)
-        results["sast_alerts"] = sast_alerts
-
-        # 2. AI Verification (Deep Scan)
-        # We verify the whole snippet. In a real-world scenario, we might only verify 
-        # the specific lines flagged by SAST, but here we check the context.
-        ai_result = expert_model.verify(request.code)
-        results["ai_verification"] = ai_result
-
-        # 3. Final Verdict Logic
-        # - If AI says VULNERABLE with high confidence (> 0.8), it's vulnerable.
-        # - If SAST finds High Risk patterns AND AI is unsure, mark as potential.
-        if ai_result.get("label") == "VULNERABLE" and ai_result.get("confidence", 0) > 0.5:
-             results["is_vulnerable"] = True
-        elif len(sast_alerts) > 0 and ai_result.get("label") == "VULNERABLE":
-             # AI confirms SAST
-             results["is_vulnerable"] = True
-        
-        return results
-
+        key = analysis_flight.make_key("code", request.model_dump())
+        return await analysis_flight.do(key, lambda: _analyze_code(request))
+    except (BatcherOverloaded, InferenceOverloaded) as e:
+        logger.warning(f"Analysis rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Analysis failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _analyze_code(request: CodeAnalysisRequest):
+    """SAST + AI verification of one snippet (shared by coalesced /code requests)."""
+    results = {
+        "sast_alerts": [],
+        "ai_verification": {},
+        "is_vulnerable": False
+    }
+
+    # 1. SAST Scan (Fast Filter)
+    # We strip the code to ensure clean input
+    sast_alerts = repo_scanner.scan_content(request.code, filename=request.filename)
+    results["sast_alerts"] = sast_alerts
+
+    # 2. AI Verification (Deep Scan)
+    # We verify the whole snippet. In a real-world scenario, we might only verify 
+    # the specific lines flagged by SAST, but here we check the context.
+    # Concurrent requests are micro-batched into a single forward pass, and long
+    # files are covered with overlapping token windows (settings.VERIFY_WINDOWED).
+    # The serving version counts tokens while encoding (cached encodings, no extra call)
+    # and splits inputs over the model limit into windows before any model work.
+    ai_result = await verify_batcher.submit(request.code)
+    results["tokens"] = ai_result.get("tokens")
+    results["ai_verification"] = ai_result
+
+    # 3. Final Verdict Logic
+    # - If AI says VULNERABLE with high confidence (> 0.8), it's vulnerable.
+    # - If SAST finds High Risk patterns AND AI is unsure, mark as potential.
+    if ai_result.get("label") == "VULNERABLE" and ai_result.get("confidence", 0) > 0.5:
+         results["is_vulnerable"] = True
+    elif len(sast_alerts) > 0 and ai_result.get("label") == "VULNERABLE":
+         # AI confirms SAST
+         results["is_vulnerable"] = True
+
+    return results
+
 @router.post("/repair")
 async def repair_code(request: CodeRepairRequest):
     """
     Generates a fix for the provided vulnerable code using the AI Repair Model (T5).
+    Identical concurrent requests share one generation (single-flight).
     """
     try:
         # We can optionally prepend the vulnerability type to the prompt
         # input_text = f"fix {request.vulnerability_type}: {request.code}"
         # But the model is trained on "fix vulnerability: ..." mostly.
         
-        fix_result = expert_model.repair(request.code)
+        # Beam search takes seconds: run it on the inference executor, not the event loop
+        key = analysis_flight.make_key("repair", request.code, request.decoding_profile)
+        fix_result = await analysis_flight.do(key, lambda: model_registry.call(
+            "repair", request.code, request.decoding_profile
+        ))
         
         if "error" in fix_result and fix_result["error"]:
              raise HTTPException(status_code=500, detail=fix_result["error"])
@@ -87,13 +128,98 @@ async def repair_code(request: CodeRepairRequest):
         return {
             "original_code": request.code,
             "fixed_code": fix_result["fixed_code"],
-            "vulnerability_type": request.vulnerability_type
+            "vulnerability_type": request.vulnerability_type,
+            "decoding_profile": request.decoding_profile or settings.REPAIR_DECODING_PROFILE,
+            "decoding": fix_result.get("decoding")
         }
 
+    except InferenceOverloaded as e:
+        logger.warning(f"Repair rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Repair failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/repair/stream")
+async def repair_code_stream(request: CodeRepairRequest):
+    """
+    Streaming repair as Server-Sent Events (greedy decoding; beam search cannot stream).
+
+    Events:
+    - data: {"delta": str}            # next piece of the fix, as soon as it is decoded
+    - event: replace, data: {"text": str}   # correction: full text so far, replaces what was received
+    - event: done, data: {"fixed_code": str, "decoding": str}  # final decode (authoritative)
+    - event: error, data: {"error": str}
+
+    Generation runs on the inference executor inside a generator; when the client
+    disconnects the response is cancelled, the generator is closed and decoding stops.
+    """
+    stream = inference_executor.stream(lambda: model_registry.iterate("iter_repair", request.code, request.decoding_profile))
+    # First delta before the response starts: overload / model errors become HTTP errors
+    try:
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except InferenceOverloaded as e:
+        logger.warning(f"Repair stream rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Repair stream failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def sse(event: dict) -> str:
+        if "delta" in event:
+            return f"data: {json.dumps(event)}\n\n"
+        return f"event: {'replace' if 'text' in event else 'done'}\ndata: {json.dumps(event)}\n\n"
+
+    async def events():
+        try:
+            if first is not None:
+                yield sse(first)
+            async for event in stream:
+                yield sse(event)
+        except Exception as e:
+            logger.error(f"Repair stream failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.post("/repair/batch")
+async def repair_code_batch(request: RepairBatchRequest):
+    """
+    Generates fixes for several snippets in padded, token-budgeted batches
+    (ExpertModel.repair_batch). Results are returned in request order; a failed
+    snippet carries an "error" instead of failing the whole request. With int8 weights
+    a fix can differ slightly from /repair for the same snippet (activation scales are
+    shared by each padded batch).
+    """
+    if not request.snippets:
+        return {"results": []}
+    if len(request.snippets) > MAX_REPAIR_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_REPAIR_BATCH} snippets per request.")
+
+    try:
+        key = analysis_flight.make_key("repair_batch", request.snippets, request.decoding_profile)
+        fixes = await analysis_flight.do(key, lambda: model_registry.call(
+            "repair_batch", request.snippets, request.decoding_profile
+        ))
+    except InferenceOverloaded as e:
+        logger.warning(f"Batch repair rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Batch repair failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "results": [
+            {"original_code": code, "fixed_code": fix["fixed_code"], "decoding": fix.get("decoding"), "error": fix.get("error")}
+            for code, fix in zip(request.snippets, fixes)
+        ],
+        "decoding_profile": request.decoding_profile or settings.REPAIR_DECODING_PROFILE
+    }
+
 @router.post("/pr")
 async def analyze_pr(request: PRAnalysisRequest):
     """
@@ -107,17 +233,63 @@ async def analyze_pr(request: PRAnalysisRequest):
     Initial Commit 대응:
     - 파일 수가 max_files를 초과하면 중요한 파일만 필터링
     - 보안 관련 키워드 우선순위 (auth, password, secret, etc.)
+
+    Webhook 재시도 / 동시 요청: 같은 PR 스캔이 진행 중이면 그 결과를 공유 (single-flight)
     """
     try:
-        result = await github_diff_scanner.scan_pr_diff(
+        key = analysis_flight.make_key("pr", request.model_dump())
+        result = await analysis_flight.do(key, lambda: github_diff_scanner.scan_pr_diff(
             owner=request.owner,
             repo=request.repo,
             pr_number=request.pr_number,
             max_files=request.max_files
-        )
+        ))
         
         return result
         
     except Exception as e:
         logger.error(f"PR scan failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/range")
+async def analyze_range(request: RangeAnalysisRequest):
+    """
+    Incremental scan of a repository between two refs (only changed hunks).
+
+    - base_ref 생략 시: 마지막으로 스캔한 SHA (scan_cursors)부터 스캔
+    - 스캔 완료 후 head SHA를 저장 → 다음 nightly 스캔의 base
+    """
+    base_ref = request.base_ref
+    if base_ref is None and db.db is not None:
+        base_ref = await db.get_last_scanned_sha(request.repo_url)
+    if base_ref is None:
+        raise HTTPException(status_code=400, detail="base_ref is required: no previous scan recorded for this repository.")
+
+    try:
+        # Mirror fetch + diff are blocking git calls
+        result = await asyncio.to_thread(repo_scanner.scan_range, request.repo_url, base_ref, request.head_ref)
+    except Exception as e:
+        logger.error(f"Range scan failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if db.db is not None:
+        await db.save_last_scanned_sha(request.repo_url, result["head"])
+    return result
+
+@router.get("/stats")
+async def analysis_stats():
+    """
+    Inference serving stats:
+    - verify_batcher: batches, avg batch size, queue depth, rejections
+    - inference_executor: pool size, torch thread budget, pending / completed calls
+    - inference_cache: hits (local / MongoDB), misses, hit rate, entries
+    - single_flight: in-flight computations, started, coalesced (duplicate requests that shared one)
+    - tokenization: encoding cache hits / misses per model
+    """
+    return {
+        "verify_batcher": verify_batcher.stats(),
+        "inference_executor": inference_executor.stats(),
+        "inference_cache": model_registry.active_model.cache.stats() if model_registry.active_model.cache is not None else None,
+        "single_flight": analysis_flight.stats(),
+        "tokenization": model_registry.active_model.tokenization_stats()
+    }
@@ -0,0 +1,83 @@
+import secrets
+from fastapi import APIRouter, HTTPException, Depends, Header
+from pydantic import BaseModel
+from typing import Optional
+from src.config import settings
+from src.services.model_registry import model_registry, RegistryError, ModelPathNotAllowed
+import logging
+
+# Lifecycle endpoints return 409 in pre-fork mode (src/prefork.py): the registry is per worker
+router = APIRouter(prefix="/models/registry", tags=["Model Registry"])
+logger = logging.getLogger(__name__)
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    """Lifecycle endpoints load and serve new weights: `Authorization: Bearer <settings.ADMIN_TOKEN>`."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model registry changes are disabled (ADMIN_TOKEN not set)")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+# --- Request Models ---
+class StageRequest(BaseModel):
+    version: str
+    detection_path: Optional[str] = None  # None -> same as the active version; else must be in MODEL_PATH_ALLOWLIST
+    repair_path: Optional[str] = None
+    backend: Optional[str] = None
+    detection_backend: Optional[str] = None  # e.g. "onnx" for a static int8 detection export
+
+class RolloutRequest(BaseModel):
+    version: str
+    percent: float = 0.0  # Share of requests served by the candidate
+    shadow_percent: float = 0.0  # Share of the other requests mirrored to it (results discarded)
+
+class VersionRequest(BaseModel):
+    version: str
+
+# --- Endpoints ---
+
+@router.get("")
+async def registry_status():
+    """Active / candidate versions, rollout split, per-version latency, shadow agreement, in-flight."""
+    return model_registry.stats()
+
+@router.post("/stage", dependencies=[Depends(require_admin)])
+async def stage_version(request: StageRequest):
+    """
+    Loads and warms up a new model version in the background (traffic is unaffected).
+    Poll GET /models/registry until its state is "ready" (or "failed").
+    """
+    try:
+        version = model_registry.stage(request.version, request.detection_path, request.repair_path, request.backend, request.detection_backend)
+    except ModelPathNotAllowed as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except RegistryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"version": version.name, "state": version.state}
+
+@router.post("/rollout", dependencies=[Depends(require_admin)])
+async def set_rollout(request: RolloutRequest):
+    """Sends `percent` of traffic to the candidate and shadows `shadow_percent` of the rest."""
+    try:
+        model_registry.set_rollout(request.version, request.percent, request.shadow_percent)
+    except RegistryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_registry.stats()
+
+@router.post("/promote", dependencies=[Depends(require_admin)])
+async def promote_version(request: VersionRequest):
+    """Atomically switches all traffic to the version; the previous one is released once drained."""
+    try:
+        model_registry.promote(request.version)
+    except RegistryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_registry.stats()
+
+@router.post("/abort", dependencies=[Depends(require_admin)])
+async def abort_version(request: VersionRequest):
+    """Drops a staged candidate."""
+    try:
+        model_registry.abort(request.version)
+    except RegistryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_registry.stats()
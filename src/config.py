@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import List
 
 # Load .env file
 load_dotenv()
@@ -19,11 +20,63 @@ class Settings(BaseSettings):
     # Service URLs
     ZAP_URL: str = "http://localhost:8080"
     ZAP_API_KEY: str = ""
+    ADMIN_TOKEN: str = ""  # Bearer token for the /models/registry lifecycle endpoints (empty = endpoints disabled)
 
     # Paths & Models
     DETECTION_MODEL_PATH: str = "kimdonghwanAIengineer/redeye-detection-quantized"
     REPAIR_MODEL_PATH: str = "kimdonghwanAIengineer/redeye-repair-quantized"
     REPAIR_BASE_MODEL: str = "t5-small"
+    INFERENCE_BACKEND: str = "torch"  # "torch" (eager, dynamic int8) | "onnx" (ONNX Runtime int8, needs the `onnx` extra)
+    DETECTION_ONNX_PATH: str = "./models/onnx/redeye-detection"  # Output of scripts/export_onnx.py (dir or HF repo)
+    REPAIR_ONNX_PATH: str = "./models/onnx/redeye-repair"
+    DETECTION_BACKEND: str = ""  # Detection-only backend override ("" = INFERENCE_BACKEND), e.g. "onnx" for the
+                                 # static int8 export (DETECTION_ONNX_PATH=./models/onnx-static/redeye-detection)
+    MODEL_PATH_ALLOWLIST: List[str] = []  # Paths / HF repos /models/registry/stage may load (JSON list; a
+                                          # local entry ending in "/" also allows the directories under it)
+    PRELOAD_MODELS: bool = False  # Load + warm up both models at startup (see /ready)
+
+    # SAST Settings
+    SAST_WORKERS: int = 0  # Process pool size for repo scans (0 = all available cores)
+    SAST_CACHE_ENABLED: bool = True  # Per-file result cache keyed by git blob SHA
+    SAST_CACHE_DIR: str = "~/.cache/redeye"
+    SAST_CACHE_MAX_ENTRIES: int = 500_000  # LRU bound of the local tier
+    SAST_CACHE_MONGO: bool = False  # Optional shared MongoDB tier
+    SAST_CACHE_COLLECTION: str = "sast_cache"
+    SAST_CACHE_MONGO_TTL_DAYS: int = 30
+    SAST_MAX_FILE_BYTES: int = 2 * 1024**2  # Larger files are skipped or scanned in windows
+    SAST_LARGE_FILE_MODE: str = "window"  # "window" (bounded mmap/stream windows) | "skip"
+    SAST_WINDOW_BYTES: int = 1024**2
+    SAST_USE_DEFAULT_EXCLUDES: bool = True  # node_modules/, vendor/, dist/, lockfiles, *.min.js ...
+    SAST_RESPECT_IGNORE_FILES: bool = True  # .redeyeignore (+ .gitignore for directory walks; never for tracked files)
+    SAST_MINIFIED_LINE_LENGTH: int = 300  # Avg line length above which a file is treated as minified (0 = off)
+    SAST_STREAM_BUFFER: int = 256  # Max alerts buffered between a streaming scan and its async consumer
+    MIRROR_CACHE_DIR: str = "~/.cache/redeye/mirrors"  # Bare git mirrors reused across scans
+    MIRROR_CACHE_MAX_BYTES: int = 5 * 1024**3
+
+    # Inference Settings
+    VERIFY_BATCH_MAX_SIZE: int = 16  # Max snippets per batched detection forward pass
+    VERIFY_BATCH_MAX_WAIT_MS: float = 10  # How long the micro-batcher waits to fill a batch
+    VERIFY_BATCH_MAX_QUEUE: int = 256  # Pending verify requests before returning 503
+    VERIFY_WINDOWED: bool = True  # /analyze/code: cover long inputs with overlapping 512-token windows
+    VERIFY_WINDOW_OVERLAP: int = 128  # Tokens shared by adjacent windows
+    VERIFY_MAX_WINDOWS: int = 32  # Per-snippet window cap (bounds latency on huge files)
+    REPAIR_DECODING_PROFILE: str = "balanced"  # fast (greedy) | balanced (beam search) | speculative (approx. greedy, input-lookup drafts)
+    REPAIR_BATCH_TOKEN_BUDGET: int = 32_768  # repair_batch: sequences x beams x (input + output tokens) per generate call
+    DETECTION_TOKENIZER: str = "microsoft/codebert-base"  # Fast tokenizers matching the trained models
+    REPAIR_TOKENIZER: str = "Salesforce/codet5-small"  # (scripts/train_repair_v3.py base model)
+    TOKENIZER_CACHE_MAX_ENTRIES: int = 4096  # Cached encodings per model (repeated hunks)
+    INFERENCE_WORKERS: int = 2  # Threads running model inference off the event loop
+    INFERENCE_TORCH_THREADS: int = 0  # torch intra-op threads (0 = available cores // INFERENCE_WORKERS)
+    INFERENCE_MAX_PENDING: int = 64  # Queued inference calls before returning 503
+    LOOP_LAG_INTERVAL_MS: float = 100  # Event-loop lag probe interval
+    INFERENCE_CACHE_ENABLED: bool = True  # verify / repair results keyed by normalized code + model version
+    INFERENCE_CACHE_MAX_ENTRIES: int = 10_000  # In-process LRU bound
+    INFERENCE_CACHE_MONGO: bool = False  # Optional shared MongoDB tier
+    INFERENCE_CACHE_COLLECTION: str = "inference_cache"
+    INFERENCE_CACHE_TTL_DAYS: int = 7
+    MODEL_MEMORY_BUDGET_MB: int = 0  # Max resident model weights (0 = unlimited); idle models are evicted first
+    MODEL_IDLE_TTL_SECONDS: float = 0  # Unload models unused for this long (0 = keep loaded)
+    MODEL_IDLE_CHECK_SECONDS: float = 60  # Idle eviction check interval
     
     # DB Settings
     DB_NAME: str = "redeye"
@@ -6,6 +6,7 @@ import uuid
 class Database:
     client: AsyncIOMotorClient = None
     db = None
+    sync_client = None  # PyMongo client for sync code paths (e.g. SAST cache)
 
     @classmethod
     async def connect(cls):
@@ -27,6 +28,25 @@ class Database:
             cls.client.close()
             cls.client = None
             print("❌ Closed MongoDB connection")
+        if cls.sync_client:
+            cls.sync_client.close()
+            cls.sync_client = None
+
+    @classmethod
+    def get_sync_collection(cls, name: str):
+        """
+        Get a collection through a (lazily created) sync PyMongo client.
+        For code that runs outside the event loop, e.g. the SAST scanner in a worker thread.
+        """
+        import certifi
+        from pymongo import MongoClient
+        if cls.sync_client is None:
+            cls.sync_client = MongoClient(
+                settings.MONGO_URI,
+                tls=True,
+                tlsCAFile=certifi.where()
+            )
+        return cls.sync_client[settings.DB_NAME][name]
 
     @classmethod
     async def get_collection(cls, name: str):
@@ -62,6 +82,22 @@ class Database:
         """Get scan by ID."""
         return await cls.db["scans"].find_one({"scan_id": scan_id}, {"_id": 0})
 
+    # --- Incremental Scan Cursors ---
+    @classmethod
+    async def get_last_scanned_sha(cls, repo_url: str):
+        """Last head SHA scanned for a repository (None if never scanned)."""
+        cursor = await cls.db["scan_cursors"].find_one({"repo_url": repo_url}, {"_id": 0})
+        return cursor["sha"] if cursor else None
+
+    @classmethod
+    async def save_last_scanned_sha(cls, repo_url: str, sha: str):
+        """Record the head SHA of a finished scan (base of the next range scan)."""
+        await cls.db["scan_cursors"].update_one(
+            {"repo_url": repo_url},
+            {"$set": {"repo_url": repo_url, "sha": sha, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
     # --- GitHub Session Management ---
     @classmethod
     async def save_user_session(cls, github_user: dict, access_token: str) -> str:
@@ -1,13 +1,72 @@
-from typing import Dict, Optional, Tuple, Any, Union
+import os
+import copy
+import functools
+import json
+import time
+import hashlib
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Tuple, Set, Any, Union
 from transformers import RobertaForSequenceClassification, RobertaTokenizer, AutoModelForSeq2SeqLM, AutoTokenizer
 import torch
 import torch.nn.functional as F
 from .config import settings
+from src.services.inference_executor import inference_executor
+from src.model_artifacts import ARTIFACT_FILE, find_int8_artifact, load_int8_artifact
+from src.inference_cache import InferenceCache
+from src.tokenization import CachedTokenizer, load_fast_tokenizer
+from src.services.model_manager import model_manager
 import logging
 
 # Configure Logging
 logger = logging.getLogger(__name__)
 
+# Max tokens per snippet for the detection model (CodeBERT position limit)
+DETECT_MAX_LENGTH = 512
+# Snippets per forward pass in `verify_batch`
+VERIFY_BATCH_SIZE = 16
+# Task prefix the repair model was trained with
+REPAIR_PREFIX = "fix vulnerability: "
+# Repair generation limits
+REPAIR_INPUT_MAX_LENGTH = 512
+REPAIR_MAX_LENGTH = 128
+# Decoding profiles for `repair` (settings.REPAIR_DECODING_PROFILE is the default):
+# - fast:        plain greedy, ~4-5x faster than beam search on CPU
+# - balanced:    beam search (the original setting)
+# - speculative: approximately greedy: drafts are copied from the input (a fix mostly
+#                repeats the vulnerable code) and scored in one multi-token decoder pass.
+#                Dynamic int8 layers quantize activations per call (one scale over the whole
+#                input), so that pass can pick a different argmax than `fast`'s one-token steps.
+REPAIR_PROFILES: Dict[str, Dict[str, Any]] = {
+    "fast": {"num_beams": 1, "do_sample": False},
+    "balanced": {
+        "num_beams": 5,
+        "early_stopping": True,
+        "repetition_penalty": 1.2,
+        "no_repeat_ngram_size": 2
+    },
+    "speculative": {"num_beams": 1, "do_sample": False},
+}
+# Decoding actually applied, reported with every repair result ("decoding")
+GREEDY, APPROXIMATE_GREEDY, BEAM_SEARCH = "greedy", "approximate_greedy", "beam_search"
+# Sequences per `repair_batch` generate call (also bounded by settings.REPAIR_BATCH_TOKEN_BUDGET)
+REPAIR_BATCH_SIZE = 16
+# Input-lookup drafting: tokens proposed per step, longest n-gram matched against the input
+REPAIR_DRAFT_TOKENS = 10
+REPAIR_DRAFT_NGRAM = 3
+# Tiny inputs used to warm up both models (first forward pass allocates / packs weights)
+WARMUP_SNIPPET = "def handler(request):\n    return eval(request.args['q'])"
+
+def _uses_model(name: str):
+    """Marks the model busy for the model manager while the method runs (no idle eviction)."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with model_manager.use(self._managed_name(name)):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
 class ExpertModel:
     """
     ExpertModel serves as the central AI engine for RedEye.
@@ -18,8 +77,37 @@ class ExpertModel:
     Resource Management:
     - Uses lazy loading to save memory (models are loaded only when requested).
     - Uses dynamic 8-bit quantization to reduce RAM usage.
+    - Loads pre-quantized safetensors artifacts (src/model_artifacts.py) via mmap when the
+      model path has one; `warm_up` preloads both models (settings.PRELOAD_MODELS).
+    - Caches verify / repair results per normalized code + model version (src/inference_cache.py).
+    - Registers loaded models with the memory governor (src/services/model_manager.py), which
+      unloads idle models and refuses loads beyond settings.MODEL_MEMORY_BUDGET_MB.
+
+    Backends (settings.INFERENCE_BACKEND):
+    - "torch": eager PyTorch with dynamic int8 quantization (default).
+    - "onnx": int8 ONNX exports (scripts/export_onnx.py) run by ONNX Runtime on CPU,
+      with a cached-past-key-values decoder for repair. Requires the `onnx` extra.
+    The detection model can use its own backend (settings.DETECTION_BACKEND), e.g. the
+    static int8 ONNX export (scripts/quantize_static_onnx.py) next to torch repair.
     """
-    def __init__(self):
+    def __init__(
+        self,
+        backend: Optional[str] = None,
+        detection_path: Optional[str] = None,
+        repair_path: Optional[str] = None,
+        name: str = "default",
+        cache: Optional[InferenceCache] = None,
+        detection_backend: Optional[str] = None
+    ):
+        self.backend = backend or settings.INFERENCE_BACKEND
+        # settings.DETECTION_BACKEND only applies when the backend is not given explicitly
+        self.detection_backend = detection_backend or (settings.DETECTION_BACKEND if backend is None else "") or self.backend
+        # Version label (model registry) and weights location; defaults come from settings
+        self.name = name
+        detect_onnx = self.detection_backend == "onnx"
+        self.detection_path = detection_path or (settings.DETECTION_ONNX_PATH if detect_onnx else settings.DETECTION_MODEL_PATH)
+        self.repair_path = repair_path or (settings.REPAIR_ONNX_PATH if self.backend == "onnx" else settings.REPAIR_MODEL_PATH)
+
         # Detection Model (CodeBERT)
         self.detect_model: Optional[RobertaForSequenceClassification] = None
         self.detect_tokenizer: Optional[RobertaTokenizer] = None
@@ -27,13 +115,32 @@ class ExpertModel:
         # Repair Model (T5-Small + LoRA)
         self.repair_model: Optional[AutoModelForSeq2SeqLM] = None
         self.repair_tokenizer: Optional[AutoTokenizer] = None
+
+        # Tokenization layers (batch encoding + encoding cache), created with each model
+        self.detect_encoder: Optional[CachedTokenizer] = None
+        self.repair_encoder: Optional[CachedTokenizer] = None
+        # One lock per model around check-and-load (concurrent first requests load once)
+        self._load_locks = {"detection": threading.Lock(), "repair": threading.Lock()}
         
         # Hardware Acceleration
         # IMPORTANT: Dynamic quantization does NOT support CUDA!
         # Quantized models MUST run on CPU
         self.device = torch.device("cpu")
         logger.info(f"🖥️ Using device: {self.device} (Quantized models require CPU)")
-        self.load_error: Optional[str] = None
+        # Last load failure per model, cleared by its next successful load (see `load_error`)
+        self._load_errors: Dict[str, str] = {}
+        # Cold-start seconds per model ("detection" / "repair") and warm-up state.
+        # `warmed_up`: each model was loaded and served once. It stays True after the
+        # model manager unloads a model: it reloads lazily on the next request.
+        self.load_seconds: Dict[str, float] = {}
+        self.warmed_up = False
+
+        # Weights each model was loaded from, and the derived version (part of cache keys)
+        self._weight_sources: Dict[str, str] = {}
+        self.model_versions: Dict[str, str] = {}
+        if cache is None and settings.INFERENCE_CACHE_ENABLED:
+            cache = InferenceCache.from_settings()
+        self.cache: Optional[InferenceCache] = cache
 
     def _load_quantized_model(self, model_class: Any, model_name_or_path: str, is_seq2seq: bool = False) -> Tuple[Any, Any]:
         """
@@ -44,8 +151,21 @@ class ExpertModel:
         2. Initialize Base Model Structure (Float32) on CPU without weights
         3. Apply Dynamic Quantization Structure (Float32 -> Int8 structure)
         4. Load Quantized State Dict (The actual weights)
+
+        Fast path: if the path (dir or HF repo) has an int8 safetensors artifact, it is
+        memory-mapped instead (no fp32 init, no pickle, no hub config/tokenizer fetch).
         """
         try:
+            hf_token = settings.HF_TOKEN if settings.HF_TOKEN else None
+            artifact_dir = find_int8_artifact(model_name_or_path, hf_token)
+            if artifact_dir is not None:
+                logger.info(f"🚀 Loading int8 safetensors artifact from {artifact_dir}...")
+                model, tokenizer = load_int8_artifact(model_class, artifact_dir)
+                self._weight_sources[model_name_or_path] = os.path.join(artifact_dir, ARTIFACT_FILE)
+                model.to(self.device)
+                logger.info(f"✅ Quantized Model Loaded (mmap): {model_name_or_path}")
+                return model, tokenizer
+
             print(f"[DEBUG] Step 1: Starting to load model from: {model_name_or_path}")
             logger.info(f"🚀 Loading Quantized Model from {model_name_or_path}...")
             logger.debug(f"HF_TOKEN set: {bool(settings.HF_TOKEN)}")
@@ -63,12 +183,13 @@ class ExpertModel:
             # 2. Load Tokenizer
             print(f"[DEBUG] Step 5: Loading tokenizer, is_seq2seq={is_seq2seq}")
             if is_seq2seq:
-                tokenizer = AutoTokenizer.from_pretrained("t5-small", token=hf_token) 
+                # The tokenizer the repair model was trained with (CodeT5, scripts/train_repair_v3.py)
+                tokenizer = load_fast_tokenizer(settings.REPAIR_TOKENIZER, hf_token)
             else:
                 # Use microsoft/codebert-base tokenizer (stable, well-tested)
                 # The custom tokenizer.json in the repo is corrupted
-                print(f"[DEBUG] Step 5.5: Using microsoft/codebert-base tokenizer")
-                tokenizer = AutoTokenizer.from_pretrained("microsoft/codebert-base", token=hf_token, use_fast=True)
+                print(f"[DEBUG] Step 5.5: Using {settings.DETECTION_TOKENIZER} tokenizer")
+                tokenizer = load_fast_tokenizer(settings.DETECTION_TOKENIZER, hf_token)
             print(f"[DEBUG] Step 6: Tokenizer loaded")
 
             # 3. Init Base Model (Empty/Random weights)
@@ -110,9 +231,10 @@ class ExpertModel:
             
             print(f"[DEBUG] Step 14: Loading weights from: {bin_path}")
             logger.info(f"📂 Loading weights from: {bin_path}")
-            state_dict = torch.load(bin_path, map_location="cpu")
+            state_dict = torch.load(bin_path, map_location="cpu", weights_only=True)  # Tensors only: no pickled code
             print(f"[DEBUG] Step 15: Weights loaded, loading into model")
             model.load_state_dict(state_dict)
+            self._weight_sources[model_name_or_path] = bin_path
             
             model.to(self.device)
             model.eval()
@@ -123,34 +245,202 @@ class ExpertModel:
             logger.error(f"❌ Failed to load Quantized Model {model_name_or_path}: {e}")
             raise e
 
+    def _load_onnx_model(self, model_name_or_path: str, is_seq2seq: bool = False) -> Tuple[Any, Any]:
+        """
+        Helper to load an int8 ONNX export (local dir or HF repo) with its tokenizer.
+        The ORT models expose the same `(**inputs).logits` / `.generate()` API as the
+        PyTorch ones, so the inference code is shared.
+        """
+        try:
+            import onnxruntime as ort
+            from optimum.onnxruntime import ORTModelForSequenceClassification, ORTModelForSeq2SeqLM
+
+            logger.info(f"🚀 Loading ONNX Model from {model_name_or_path}...")
+            hf_token = settings.HF_TOKEN if settings.HF_TOKEN else None
+
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = inference_executor.thread_budget()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+            if is_seq2seq:
+                # Encoder + decoder + decoder-with-past (reuses cached key/values while decoding)
+                model = ORTModelForSeq2SeqLM.from_pretrained(
+                    model_name_or_path, use_cache=True, session_options=options,
+                    provider="CPUExecutionProvider", token=hf_token
+                )
+            else:
+                model = ORTModelForSequenceClassification.from_pretrained(
+                    model_name_or_path, session_options=options,
+                    provider="CPUExecutionProvider", token=hf_token
+                )
+            # The export script saves the exact tokenizer used by the torch backend
+            tokenizer = load_fast_tokenizer(model_name_or_path, hf_token)
+            self._weight_sources[model_name_or_path] = str(getattr(model, "model_save_dir", model_name_or_path))
+
+            # Static int8 exports describe their quantization (scripts/quantize_static_onnx.py)
+            quantization = "dynamic int8"
+            card_path = os.path.join(self._weight_sources[model_name_or_path], "quantization.json")
+            if os.path.exists(card_path):
+                with open(card_path, "r", encoding="utf-8") as f:
+                    card = json.load(f)
+                quantization = f"{card.get('method', 'static')} int8, {card.get('calibration', {}).get('samples', '?')} calibration samples"
+
+            logger.info(f"✅ ONNX Model Loaded: {model_name_or_path} ({quantization})")
+            return model, tokenizer
+
+        except Exception as e:
+            logger.error(f"❌ Failed to load ONNX Model {model_name_or_path}: {e}")
+            raise e
+
     def load_detection_model(self):
-        """Lazy load the detection model (Quantized)."""
+        """Lazy load the detection model (Quantized). Concurrent first callers share one load."""
         if self.detect_model and self.detect_tokenizer:
             return 
 
-        try:
-            self.detect_model, self.detect_tokenizer = self._load_quantized_model(
-                RobertaForSequenceClassification, 
-                settings.DETECTION_MODEL_PATH
-            )
-        except Exception as e:
-             self.load_error = f"Detection Model Error: {str(e)}"
-             self.detect_model = None
+        with self._load_locks["detection"]:
+            if self.detect_model and self.detect_tokenizer:
+                return  # Loaded by the caller we waited for
+
+            start = time.perf_counter()
+            try:
+                model_manager.admit(self._managed_name("detection"))
+                path = self.detection_path
+                if self.detection_backend == "onnx":
+                    model, tokenizer = self._load_onnx_model(path)
+                else:
+                    model, tokenizer = self._load_quantized_model(
+                        RobertaForSequenceClassification, 
+                        path
+                    )
+                # Model last: callers outside the lock only check detect_model / detect_tokenizer
+                self.detect_encoder = CachedTokenizer(tokenizer, settings.TOKENIZER_CACHE_MAX_ENTRIES)
+                self.detect_tokenizer = tokenizer
+                self.detect_model = model
+                self._record_load_time("detection", start, path, tokenizer)
+                self._load_errors.pop("detection", None)
+                model_manager.register(self._managed_name("detection"), model, self.unload_detection_model)
+            except Exception as e:
+                 self._load_errors["detection"] = f"Detection Model Error: {str(e)}"
+                 self.detect_model = None
 
     def load_repair_model(self):
-        """Lazy load the repair model (Quantized)."""
+        """Lazy load the repair model (Quantized). Concurrent first callers share one load."""
         if self.repair_model and self.repair_tokenizer:
             return 
 
-        try:
-            self.repair_model, self.repair_tokenizer = self._load_quantized_model(
-                AutoModelForSeq2SeqLM, 
-                settings.REPAIR_MODEL_PATH,
-                is_seq2seq=True
-            )
-        except Exception as e:
-            self.load_error = f"Repair Model Error: {str(e)}"
-            self.repair_model = None
+        with self._load_locks["repair"]:
+            if self.repair_model and self.repair_tokenizer:
+                return  # Loaded by the caller we waited for
+
+            start = time.perf_counter()
+            try:
+                model_manager.admit(self._managed_name("repair"))
+                path = self.repair_path
+                if self.backend == "onnx":
+                    model, tokenizer = self._load_onnx_model(path, is_seq2seq=True)
+                else:
+                    model, tokenizer = self._load_quantized_model(
+                        AutoModelForSeq2SeqLM, 
+                        path,
+                        is_seq2seq=True
+                    )
+                if type(tokenizer).__name__.startswith("T5Tokenizer"):
+                    # Artifacts / ONNX exports made before the tokenizer fix bundle t5-small's
+                    logger.warning(
+                        f"⚠️ {path} bundles a T5 tokenizer, not the CodeT5 one the repair model was trained with; "
+                        f"regenerate it (scripts/convert_int8_safetensors.py / scripts/export_onnx.py)"
+                    )
+                # Model last: callers outside the lock only check repair_model / repair_tokenizer
+                self.repair_encoder = CachedTokenizer(tokenizer, settings.TOKENIZER_CACHE_MAX_ENTRIES)
+                self.repair_tokenizer = tokenizer
+                self.repair_model = model
+                self._record_load_time("repair", start, path, tokenizer)
+                self._load_errors.pop("repair", None)
+                model_manager.register(self._managed_name("repair"), model, self.unload_repair_model)
+            except Exception as e:
+                self._load_errors["repair"] = f"Repair Model Error: {str(e)}"
+                self.repair_model = None
+
+    def unload_detection_model(self):
+        """Drops the detection model (called by the model manager; reloaded lazily on next use)."""
+        self.detect_model = None
+        self.detect_tokenizer = None
+        self.detect_encoder = None
+
+    def unload_repair_model(self):
+        """Drops the repair model (called by the model manager; reloaded lazily on next use)."""
+        self.repair_model = None
+        self.repair_tokenizer = None
+        self.repair_encoder = None
+
+    def release(self):
+        """Unloads both models (retired registry version); they would reload lazily if used again."""
+        for name, unload in (("detection", self.unload_detection_model), ("repair", self.unload_repair_model)):
+            if not model_manager.unload(self._managed_name(name), reason="released"):
+                unload()
+
+    def _backend_of(self, name: str) -> str:
+        return self.detection_backend if name == "detection" else self.backend
+
+    def _managed_name(self, name: str) -> str:
+        return f"{self.name}/{self._backend_of(name)}:{name}"
+
+    def _record_load_time(self, name: str, start: float, path: str, tokenizer: Any):
+        self.load_seconds[name] = round(time.perf_counter() - start, 3)
+        backend = self._backend_of(name)
+        # The tokenizer is part of the version: the same weights fed different token ids
+        # (e.g. the old t5-small tokenizer for the CodeT5 repair model) give different outputs
+        weights = _weights_fingerprint(path, self._weight_sources.get(path, path))
+        self.model_versions[name] = f"{backend}:{weights}:tok-{_tokenizer_fingerprint(tokenizer)}"
+        logger.info(
+            f"⏱️ {name} model cold start: {self.load_seconds[name]:.2f}s "
+            f"({backend}, version {self.model_versions[name]})"
+        )
+
+    @property
+    def load_error(self) -> Optional[str]:
+        """Current load failures ("detection" / "repair" / a failed warm-up), None if there are none."""
+        return "; ".join(self._load_errors.values()) or None
+
+    @load_error.setter
+    def load_error(self, error: Optional[str]):
+        if error is None:
+            self._load_errors.pop("warm_up", None)
+        else:
+            self._load_errors["warm_up"] = error
+
+    def warm_up(self):
+        """
+        Loads each model and runs one inference with it, so the first real request
+        does not pay for loading, weight packing or allocator warm-up. One model at a
+        time: under a memory budget that holds only one, loading repair may evict
+        detection, which still counts as warmed up (it reloads lazily).
+        """
+        start = time.perf_counter()
+        self.load_error = None
+        served = []
+        self.load_detection_model()
+        if self.detect_model is not None and not self.verify(WARMUP_SNIPPET).get("error"):
+            served.append("detection")
+        self.load_repair_model()
+        if self.repair_model is not None and not self.repair(WARMUP_SNIPPET).get("error"):
+            served.append("repair")
+        self.warmed_up = self.warmed_up or served == ["detection", "repair"]
+        self.load_seconds["warm_up_total"] = round(time.perf_counter() - start, 3)
+        logger.info(f"🔥 Model warm-up finished in {self.load_seconds['warm_up_total']:.2f}s (ready={self.warmed_up})")
+
+    def readiness(self) -> Dict[str, Any]:
+        return {
+            "version": self.name,
+            "backend": self.backend,
+            "detection_backend": self.detection_backend,
+            "detection_loaded": self.detect_model is not None,
+            "repair_loaded": self.repair_model is not None,
+            "warmed_up": self.warmed_up,
+            "load_seconds": dict(self.load_seconds),
+            "model_versions": dict(self.model_versions),
+            "error": self.load_error
+        }
 
     def verify(self, code_snippet: str) -> Dict[str, Union[str, float]]:
         """
@@ -167,50 +457,221 @@ class ExpertModel:
                 "error": str (optional)
             }
         """
+        return self.verify_batch([code_snippet], batch_size=1)[0]
+
+    def verify_windowed(self, code: str) -> Dict[str, Any]:
+        """
+        Long-file `verify`: covers the whole input instead of truncating at 512 tokens.
+        See `verify_batch(..., windowed=True)` for the result format.
+        """
+        return self.verify_batch([code], windowed=True)[0]
+
+    @_uses_model("detection")
+    def verify_batch(
+        self,
+        code_snippets: List[str],
+        batch_size: int = VERIFY_BATCH_SIZE,
+        windowed: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Batched `verify`: one result dict per snippet, in input order.
+
+        Snippets are tokenized once, sorted by token length and split into buckets of
+        `batch_size`, so each forward pass only pads to the longest input of its
+        bucket. A failing bucket yields ERROR results for its snippets only.
+
+        windowed=True: inputs longer than the model limit are split into overlapping
+        token windows (VERIFY_WINDOW_OVERLAP tokens, at most VERIFY_MAX_WINDOWS per
+        snippet), all windows are batched together, and each snippet gets the verdict
+        of its most vulnerable window plus:
+            "tokens": int (untruncated input length, from the cached encoding),
+            "windows": int,
+            "truncated": bool (window cap reached, the tail was not examined),
+            "vulnerable_ranges": [{"start_line", "end_line", "confidence"}] (1-based, merged)
+        """
+        if not code_snippets:
+            return []
+
         # Lazy Load
         if not self.detect_model or not self.detect_tokenizer:
             self.load_detection_model()
             
         if not self.detect_model or not self.detect_tokenizer:
-            return {"label": "ERROR", "confidence": 0.0, "error": f"Model load failed: {self.load_error}"}
+            return [
+                {"label": "ERROR", "confidence": 0.0, "error": f"Model load failed: {self.load_error}"}
+                for _ in code_snippets
+            ]
+
+        if self.cache is None:
+            return self._verify_uncached(code_snippets, batch_size, windowed)
+
+        # Windowed results carry line numbers, so they are keyed on the exact code
+        version = self.model_versions.get("detection", "")
+        keys = [
+            self.cache.make_key("verify", version, code, exact=windowed, windowed=windowed)
+            for code in code_snippets
+        ]
+        cached = self.cache.get_many(keys)
+        misses = [i for i, key in enumerate(keys) if key not in cached]
+        fresh = self._verify_uncached([code_snippets[i] for i in misses], batch_size, windowed) if misses else []
 
+        results = [copy.deepcopy(cached[key]) if key in cached else None for key in keys]
+        for i, result in zip(misses, fresh):
+            results[i] = result
+        self.cache.put_many({
+            keys[i]: copy.deepcopy(result) for i, result in zip(misses, fresh) if result["label"] != "ERROR"
+        })
+        return results
+
+    def _verify_uncached(self, code_snippets: List[str], batch_size: int, windowed: bool) -> List[Dict[str, Any]]:
         try:
-            # Tokenize & Move to Device
-            inputs = self.detect_tokenizer(
-                code_snippet, 
-                return_tensors="pt", 
-                truncation=True, 
-                max_length=512
-            ).to(self.device)
-            
-            # Inference
-            with torch.no_grad():
-                logits = self.detect_model(**inputs).logits
-                probs = F.softmax(logits, dim=-1)
-                prediction = torch.argmax(probs, dim=-1).item()
-                
-            label = "VULNERABLE" if prediction == 1 else "SAFE"
-            confidence = probs[0][prediction].item()
-            
-            return {
-                "label": label,
-                "confidence": round(confidence, 4)
-            }
+            encodings = self.detect_encoder.encode_batch(code_snippets)
+            encoded = [self._detection_windows(code, encoding, windowed) for code, encoding in zip(code_snippets, encodings)]
         except Exception as e:
-            logger.error(f"Inference failed: {e}")
-            return {"label": "ERROR", "confidence": 0.0, "error": f"Inference failed: {str(e)}"}
+            logger.error(f"Tokenization failed: {e}")
+            return [{"label": "ERROR", "confidence": 0.0, "error": f"Inference failed: {str(e)}"} for _ in code_snippets]
+
+        # Every window of every snippet goes through the same length-sorted buckets
+        flat = [features for windows, _ in encoded for features, _ in windows]
+        scores = iter(self._vulnerable_probs(flat, batch_size))
+
+        results = []
+        for (windows, truncated), (ids, _) in zip(encoded, encodings):
+            window_scores = [next(scores) for _ in windows]
+            error = next((score for score in window_scores if isinstance(score, Exception)), None)
+            if error is not None:
+                results.append({"label": "ERROR", "confidence": 0.0, "error": f"Inference failed: {str(error)}"})
+                continue
+
+            result = self._verdict(max(window_scores))
+            if windowed:
+                result["tokens"] = len(ids) + self.detect_encoder.num_special
+                result["windows"] = len(windows)
+                result["truncated"] = truncated
+                result["vulnerable_ranges"] = _merge_ranges([
+                    (lines[0], lines[1], score)
+                    for (_, lines), score in zip(windows, window_scores)
+                    if self._verdict(score)["label"] == "VULNERABLE"
+                ])
+            results.append(result)
+
+        return results
+
+    def _detection_windows(
+        self,
+        code: str,
+        encoding: Tuple[List[int], Optional[List[Tuple[int, int]]]],
+        windowed: bool
+    ) -> Tuple[List[Tuple[Dict[str, List[int]], Tuple[int, int]]], bool]:
+        """
+        Splits one encoded snippet (see CachedTokenizer) into model inputs:
+        [(features, (start_line, end_line)), ...] and whether the window cap cut off
+        the end of the input.
+        """
+        encoder = self.detect_encoder
+        if not windowed:
+            features = encoder.model_input(encoding, DETECT_MAX_LENGTH)
+            return [(features, (1, code.count("\n") + 1))], False
 
-    def repair(self, vulnerable_code: str) -> Dict[str, str]:
+        tokenizer = self.detect_tokenizer
+        ids, offsets = encoding
+        body = DETECT_MAX_LENGTH - encoder.num_special
+        step = max(1, body - settings.VERIFY_WINDOW_OVERLAP)
+
+        starts = [0]
+        while starts[-1] + body < len(ids) and len(starts) < settings.VERIFY_MAX_WINDOWS:
+            starts.append(starts[-1] + step)
+        truncated = starts[-1] + body < len(ids)
+
+        newlines = [i for i, char in enumerate(code) if char == "\n"]
+        windows = []
+        for start in starts:
+            chunk = ids[start:start + body]
+            input_ids = tokenizer.build_inputs_with_special_tokens(chunk)
+            if chunk and offsets is not None:
+                first_char = offsets[start][0]
+                last_char = max(first_char, offsets[start + len(chunk) - 1][1] - 1)
+                lines = (bisect_left(newlines, first_char) + 1, bisect_left(newlines, last_char) + 1)
+            else:
+                lines = (1, code.count("\n") + 1) if chunk else (1, 1)
+            windows.append(({"input_ids": input_ids, "attention_mask": [1] * len(input_ids)}, lines))
+        return windows, truncated
+
+    def _vulnerable_probs(self, features: List[Dict[str, List[int]]], batch_size: int) -> List[Union[float, Exception]]:
+        """P(VULNERABLE) per input (or the exception of its failed bucket), in input order."""
+        order = sorted(range(len(features)), key=lambda i: len(features[i]["input_ids"]))
+        scores: List[Union[float, Exception, None]] = [None] * len(features)
+        for start in range(0, len(order), max(1, batch_size)):
+            bucket = order[start:start + max(1, batch_size)]
+            try:
+                # Pad only up to the longest input of this bucket
+                inputs = self.detect_tokenizer.pad(
+                    [features[i] for i in bucket],
+                    return_tensors="pt"
+                ).to(self.device)
+
+                # Inference
+                with torch.no_grad():
+                    logits = self.detect_model(**inputs).logits
+                    probs = F.softmax(logits, dim=-1)
+
+                for row, i in enumerate(bucket):
+                    scores[i] = probs[row][1].item()
+            except Exception as e:
+                logger.error(f"Inference failed: {e}")
+                for i in bucket:
+                    scores[i] = e
+        return scores
+
+    def count_tokens(self, snippets: List[str], model: str = "detection") -> List[int]:
+        """
+        Untruncated input length of each snippet for the detection (or repair) model,
+        before any model work. Inputs longer than DETECT_MAX_LENGTH need the windowed
+        path. Encodings are cached, so a following verify / repair does not re-tokenize.
+        (`verify_batch(windowed=True)` reports the same count as "tokens".)
+        """
+        with model_manager.use(self._managed_name(model)):
+            if model == "repair":
+                if not self.repair_encoder:
+                    self.load_repair_model()
+                if not self.repair_encoder:
+                    raise RuntimeError(f"Model load failed: {self.load_error}")
+                return self.repair_encoder.token_counts([REPAIR_PREFIX + code for code in snippets])
+
+            if not self.detect_encoder:
+                self.load_detection_model()
+            if not self.detect_encoder:
+                raise RuntimeError(f"Model load failed: {self.load_error}")
+            return self.detect_encoder.token_counts(snippets)
+
+    def tokenization_stats(self) -> Dict[str, Any]:
+        return {
+            "detection": self.detect_encoder.stats() if self.detect_encoder else None,
+            "repair": self.repair_encoder.stats() if self.repair_encoder else None
+        }
+
+    @staticmethod
+    def _verdict(vulnerable_prob: float) -> Dict[str, Any]:
+        # Same decision as argmax over (SAFE, VULNERABLE)
+        if vulnerable_prob > 0.5:
+            return {"label": "VULNERABLE", "confidence": round(vulnerable_prob, 4)}
+        return {"label": "SAFE", "confidence": round(1 - vulnerable_prob, 4)}
+
+    @_uses_model("repair")
+    def repair(self, vulnerable_code: str, profile: Optional[str] = None) -> Dict[str, str]:
         """
         [API Endpoint Helper]
         Generates a secure fix for the provided vulnerable code.
 
         Args:
             vulnerable_code (str): The code that needs fixing.
+            profile (str): Decoding profile (REPAIR_PROFILES), default settings.REPAIR_DECODING_PROFILE.
+                "speculative" runs on the torch backend only (ONNX falls back to "fast").
 
         Returns:
             dict: {
                 "fixed_code": str,
+                "decoding": str (greedy | approximate_greedy | beam_search),
                 "error": str (optional)
             }
         """
@@ -221,30 +682,326 @@ class ExpertModel:
         if not self.repair_model or not self.repair_tokenizer:
             return {"fixed_code": "", "error": f"Model load failed: {self.load_error}"}
 
+        profile = profile or settings.REPAIR_DECODING_PROFILE
+        if profile not in REPAIR_PROFILES:
+            return {"fixed_code": "", "error": f"Unknown decoding profile: {profile}"}
+
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key("repair", self.model_versions.get("repair", ""), vulnerable_code, profile=profile, decoding=self._decoding(profile))
+            cached = self.cache.get(key)
+            if cached is not None:
+                return dict(cached)
+
         try:
-            input_text = f"fix vulnerability: {vulnerable_code}"
-            inputs = self.repair_tokenizer(
-                input_text, 
-                return_tensors="pt", 
-                truncation=True, 
-                max_length=512
-            ).to(self.device)
+            inputs = self._repair_inputs([vulnerable_code])
 
             with torch.no_grad():
-                outputs = self.repair_model.generate(
-                    **inputs,
-                    max_length=128,
-                    num_beams=5,
-                    early_stopping=True,
-                    repetition_penalty=1.2,
-                    no_repeat_ngram_size=2
-                )
+                if profile == "speculative" and self.backend == "torch":
+                    output_ids = self._generate_input_lookup(inputs)
+                else:
+                    output_ids = self.repair_model.generate(
+                        **inputs,
+                        max_length=REPAIR_MAX_LENGTH,
+                        **REPAIR_PROFILES[profile]
+                    )[0]
             
-            fix = self.repair_tokenizer.decode(outputs[0], skip_special_tokens=True)
-            return {"fixed_code": fix}
+            fix = self.repair_tokenizer.decode(output_ids, skip_special_tokens=True)
+            result = {"fixed_code": fix, "decoding": self._decoding(profile)}
+            if key is not None:
+                self.cache.put(key, result)
+            return dict(result)
             
         except Exception as e:
             logger.error(f"Generation failed: {e}")
             return {"fixed_code": "", "error": f"Generation failed: {str(e)}"}
 
+    @_uses_model("repair")
+    def repair_batch(
+        self,
+        snippets: List[str],
+        profile: Optional[str] = None,
+        token_budget: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Batched `repair`: one result dict per snippet, in input order.
+
+        Inputs are sorted by token length and grouped into padded generate calls. A group
+        is closed when it reaches REPAIR_BATCH_SIZE or when
+            sequences x beams x (longest input + REPAIR_MAX_LENGTH)
+        would exceed `token_budget` (settings.REPAIR_BATCH_TOKEN_BUDGET), which bounds the
+        memory of beam search (every beam keeps its own KV cache). A failing group yields
+        error results for its snippets only.
+
+        Dynamic int8 layers quantize activations with one scale over the whole padded
+        group, so a snippet's fix can depend on its batchmates and may differ from `repair`.
+        Only snippets decoded alone are written to the result cache (shared with `repair`).
+
+        "speculative" drafts per sequence, so on the torch backend its snippets are
+        decoded one by one (same result as `repair`), not in padded groups.
+        """
+        if not snippets:
+            return []
+
+        # Lazy Load
+        if not self.repair_model or not self.repair_tokenizer:
+            self.load_repair_model()
+
+        if not self.repair_model or not self.repair_tokenizer:
+            return [{"fixed_code": "", "error": f"Model load failed: {self.load_error}"} for _ in snippets]
+
+        profile = profile or settings.REPAIR_DECODING_PROFILE
+        if profile not in REPAIR_PROFILES:
+            return [{"fixed_code": "", "error": f"Unknown decoding profile: {profile}"} for _ in snippets]
+        budget = token_budget or settings.REPAIR_BATCH_TOKEN_BUDGET
+
+        if self.cache is None:
+            return self._repair_uncached_batch(snippets, profile, budget)[0]
+
+        version = self.model_versions.get("repair", "")
+        decoding = self._decoding(profile)  # In the key: the result depends on the decoding actually run
+        keys = [self.cache.make_key("repair", version, code, profile=profile, decoding=decoding) for code in snippets]
+        cached = self.cache.get_many(keys)
+        misses = [i for i, key in enumerate(keys) if key not in cached]
+        fresh, alone = self._repair_uncached_batch([snippets[i] for i in misses], profile, budget) if misses else ([], set())
+
+        results = [dict(cached[key]) if key in cached else None for key in keys]
+        for i, result in zip(misses, fresh):
+            results[i] = result
+        self.cache.put_many({
+            keys[i]: dict(result) for j, (i, result) in enumerate(zip(misses, fresh))
+            if j in alone and not result.get("error")
+        })
+        return results
+
+    def _repair_uncached_batch(self, snippets: List[str], profile: str, token_budget: int) -> Tuple[List[Dict[str, str]], Set[int]]:
+        """Results in input order, and the indices decoded alone (same output as `repair`)."""
+        try:
+            features = self.repair_encoder.model_inputs([REPAIR_PREFIX + code for code in snippets], REPAIR_INPUT_MAX_LENGTH)
+        except Exception as e:
+            logger.error(f"Tokenization failed: {e}")
+            return [{"fixed_code": "", "error": f"Generation failed: {str(e)}"} for _ in snippets], set()
+
+        results: List[Optional[Dict[str, str]]] = [None] * len(snippets)
+        decoding = self._decoding(profile)
+        if decoding == APPROXIMATE_GREEDY:
+            for i, feature in enumerate(features):
+                try:
+                    inputs = self.repair_tokenizer.pad([feature], return_tensors="pt").to(self.device)
+                    with torch.no_grad():
+                        output_ids = self._generate_input_lookup(inputs)
+                    results[i] = {"fixed_code": self.repair_tokenizer.decode(output_ids, skip_special_tokens=True), "decoding": decoding}
+                except Exception as e:
+                    logger.error(f"Generation failed: {e}")
+                    results[i] = {"fixed_code": "", "error": f"Generation failed: {str(e)}"}
+            return results, set(range(len(snippets)))
+
+        generate_kwargs = REPAIR_PROFILES[profile]
+        beams = generate_kwargs.get("num_beams", 1)
+        order = sorted(range(len(snippets)), key=lambda i: len(features[i]["input_ids"]), reverse=True)
+
+        # Longest first: each group's padded length is its first element's length
+        groups: List[List[int]] = []
+        for i in order:
+            cost = beams * (len(features[i]["input_ids"]) + REPAIR_MAX_LENGTH)
+            if groups and len(groups[-1]) < REPAIR_BATCH_SIZE and group_cost * (len(groups[-1]) + 1) <= token_budget:
+                groups[-1].append(i)
+            else:
+                groups.append([i])
+                group_cost = cost
+
+        for group in groups:
+            try:
+                batch = self.repair_tokenizer.pad([features[i] for i in group], return_tensors="pt").to(self.device)
+                with torch.no_grad():
+                    outputs = self.repair_model.generate(
+                        **batch,
+                        max_length=REPAIR_MAX_LENGTH,
+                        **generate_kwargs
+                    )
+                fixes = self.repair_tokenizer.batch_decode(outputs, skip_special_tokens=True)
+                for i, fix in zip(group, fixes):
+                    results[i] = {"fixed_code": fix, "decoding": decoding}
+            except Exception as e:
+                logger.error(f"Batch generation failed: {e}")
+                for i in group:
+                    results[i] = {"fixed_code": "", "error": f"Generation failed: {str(e)}"}
+        return results, {group[0] for group in groups if len(group) == 1}
+
+    def iter_repair(self, vulnerable_code: str, profile: Optional[str] = None) -> Iterator[Dict[str, str]]:
+        """
+        Streaming `repair`: yields the fix while it is generated, as events:
+        - {"delta": str}: text appended to what was sent so far
+        - {"text": str}: correction, the full text so far replaces what was sent (re-decoding
+          the longer prefix changed already-sent text, e.g. a sentencepiece merge)
+        - {"fixed_code": str, "decoding": str}: last event, the final decode
+
+        Beam search cannot stream (the best beam is only known at the end), so this
+        decodes greedily, with input-lookup drafts unless profile == "fast" (on torch).
+        With drafts the result is the approximately greedy "speculative" one, without
+        them the "fast" one. Decoding runs inside the generator: closing it stops
+        generation at the next step.
+        Raises RuntimeError if the model cannot be loaded.
+        """
+        # Held for the generator's lifetime: the model manager must not unload it mid-stream
+        with model_manager.use(self._managed_name("repair")):
+            # Lazy Load
+            if not self.repair_model or not self.repair_tokenizer:
+                self.load_repair_model()
+
+            if not self.repair_model or not self.repair_tokenizer:
+                raise RuntimeError(f"Model load failed: {self.load_error}")
+
+            inputs = self._repair_inputs([vulnerable_code])
+            # KV-cache cropping for rejected drafts is only implemented for torch models
+            draft_tokens = REPAIR_DRAFT_TOKENS if profile != "fast" and self.backend == "torch" else 0
+
+            generated: List[int] = []
+            emitted = ""
+            with torch.no_grad():
+                for new_tokens in self._iter_greedy(inputs, draft_tokens):
+                    generated.extend(new_tokens)
+                    # Decode the whole prefix: sentencepiece merges make per-token decoding lossy
+                    text = self.repair_tokenizer.decode(generated, skip_special_tokens=True)
+                    if text == emitted:
+                        continue
+                    if text.startswith(emitted):
+                        yield {"delta": text[len(emitted):]}
+                    else:
+                        yield {"text": text}
+                    emitted = text
+            yield {
+                "fixed_code": self.repair_tokenizer.decode(generated, skip_special_tokens=True),
+                "decoding": APPROXIMATE_GREEDY if draft_tokens else GREEDY
+            }
+
+    def _decoding(self, profile: str) -> str:
+        """Decoding a profile runs on this backend (`speculative` drafts need the torch KV cache)."""
+        if profile == "speculative" and self.backend == "torch":
+            return APPROXIMATE_GREEDY
+        return BEAM_SEARCH if REPAIR_PROFILES[profile].get("num_beams", 1) > 1 else GREEDY
+
+    def _repair_inputs(self, snippets: List[str]) -> Dict[str, torch.Tensor]:
+        """Padded repair model inputs (prefix + code, truncated), via the encoding cache."""
+        features = self.repair_encoder.model_inputs([REPAIR_PREFIX + code for code in snippets], REPAIR_INPUT_MAX_LENGTH)
+        return self.repair_tokenizer.pad(features, return_tensors="pt").to(self.device)
+
+    def _generate_input_lookup(self, inputs: Dict[str, torch.Tensor]) -> List[int]:
+        """
+        Greedy decoding with drafts looked up in the input (prompt-lookup decoding):
+        copied spans cost one forward pass instead of one per token (see `_iter_greedy`).
+        Approximately greedy with dynamic int8 weights (see REPAIR_PROFILES).
+        (transformers' `prompt_lookup_num_tokens` only searches decoder tokens for
+        encoder-decoder models, so it cannot copy from the input.)
+        """
+        generated = [self.repair_model.config.decoder_start_token_id]
+        for new_tokens in self._iter_greedy(inputs, REPAIR_DRAFT_TOKENS):
+            generated.extend(new_tokens)
+        return generated
+
+    def _iter_greedy(self, inputs: Dict[str, torch.Tensor], draft_tokens: int) -> Iterator[List[int]]:
+        """
+        Greedy decoding loop of the repair model, yielding the new token ids of each step.
+
+        With `draft_tokens` > 0, each step takes the last generated n-gram, finds it in
+        the input tokens and proposes the `draft_tokens` that follow it there. One decoder
+        pass scores all of them; the longest prefix that matches the model's own argmax
+        is kept, plus the model's next token. That multi-token pass is exact for float
+        weights only: dynamic int8 layers scale activations over the whole pass.
+        """
+        model = self.repair_model
+        source = inputs["input_ids"][0].tolist()
+        attention_mask = inputs["attention_mask"]
+        encoder_outputs = model.get_encoder()(input_ids=inputs["input_ids"], attention_mask=attention_mask, return_dict=True)
+        eos_token_id = model.config.eos_token_id
+
+        generated = [model.config.decoder_start_token_id]
+        pending = list(generated)  # Generated tokens not yet in the KV cache
+        past_key_values = None
+        while len(generated) < REPAIR_MAX_LENGTH:
+            draft = _lookup_draft(source, generated, REPAIR_DRAFT_NGRAM, draft_tokens) if draft_tokens else []
+            draft = draft[:max(0, REPAIR_MAX_LENGTH - len(generated) - 1)]
+
+            outputs = model(
+                encoder_outputs=encoder_outputs,
+                attention_mask=attention_mask,
+                decoder_input_ids=torch.tensor([pending + draft], device=self.device),
+                past_key_values=past_key_values,
+                use_cache=True,
+                return_dict=True
+            )
+            predictions = outputs.logits[0, len(pending) - 1:].argmax(-1).tolist()
+            accepted = 0
+            while accepted < len(draft) and draft[accepted] == predictions[accepted]:
+                accepted += 1
+
+            # Cache holds generated + draft; rejected draft positions are dropped
+            past_key_values = outputs.past_key_values
+            if accepted < len(draft):
+                past_key_values = _crop_past(past_key_values, len(generated) + accepted)
+            new_tokens = draft[:accepted] + [predictions[accepted]]
+            if eos_token_id in new_tokens:
+                yield new_tokens[:new_tokens.index(eos_token_id) + 1]
+                return
+            generated.extend(new_tokens)
+            pending = [new_tokens[-1]]
+            yield new_tokens
+
+def _lookup_draft(source: List[int], generated: List[int], max_ngram: int, num_tokens: int) -> List[int]:
+    """Tokens that follow the longest suffix n-gram of `generated` found in `source` (first match)."""
+    for n in range(min(max_ngram, len(generated) - 1), 0, -1):
+        ngram = generated[-n:]
+        for i in range(len(source) - n):
+            if source[i:i + n] == ngram:
+                return source[i + n:i + n + num_tokens]
+    return []
+
+def _crop_past(past_key_values: Any, length: int) -> Any:
+    """Keeps the first `length` decoder positions of a (legacy tuple or Cache) KV cache."""
+    if hasattr(past_key_values, "crop"):
+        past_key_values.crop(length)
+        return past_key_values
+    # Legacy encoder-decoder layout: (self_k, self_v, cross_k, cross_v) per layer
+    return tuple(
+        (layer[0][:, :, :length], layer[1][:, :, :length]) + tuple(layer[2:])
+        for layer in past_key_values
+    )
+
+def _weights_fingerprint(configured_path: str, source: str) -> str:
+    """
+    Short hash identifying the loaded weights: the resolved file(s) with size and mtime.
+    Hub downloads resolve to content-addressed blobs, so a new upload changes it too.
+    """
+    files = [source]
+    if os.path.isdir(source):
+        files = sorted(
+            os.path.join(source, name) for name in os.listdir(source)
+            if name.endswith((".bin", ".safetensors", ".onnx"))
+        )
+    stats = []
+    for path in files:
+        try:
+            real = os.path.realpath(path)
+            stats.append([real, os.path.getsize(real), int(os.path.getmtime(real))])
+        except OSError:
+            stats.append([path])
+    return hashlib.sha256(json.dumps([configured_path, stats]).encode("utf-8")).hexdigest()[:12]
+
+def _tokenizer_fingerprint(tokenizer: Any) -> str:
+    """Short hash of a tokenizer's implementation, vocabulary and special tokens."""
+    vocab = sorted(tokenizer.get_vocab().items(), key=lambda item: item[1])
+    payload = json.dumps([type(tokenizer).__name__, vocab, tokenizer.all_special_tokens], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+def _merge_ranges(ranges: List[Tuple[int, int, float]]) -> List[Dict[str, Any]]:
+    """Merges overlapping/adjacent (start_line, end_line, prob) windows, keeping the max confidence."""
+    merged: List[Dict[str, Any]] = []
+    for start_line, end_line, prob in sorted(ranges):
+        if merged and start_line <= merged[-1]["end_line"] + 1:
+            merged[-1]["end_line"] = max(merged[-1]["end_line"], end_line)
+            merged[-1]["confidence"] = max(merged[-1]["confidence"], round(prob, 4))
+        else:
+            merged.append({"start_line": start_line, "end_line": end_line, "confidence": round(prob, 4)})
+    return merged
+
 expert_model = ExpertModel()
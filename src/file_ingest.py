@@ -0,0 +1,380 @@
+"""
+File ingestion layer for the SAST scanner.
+
+Every file (on disk or a git blob) goes through the same steps:
+1. Size check  - files above SAST_MAX_FILE_BYTES are skipped or scanned in windows.
+2. Sniffing    - the first few KB decide binary (NUL bytes) vs text and the encoding,
+                 and skip minified code (average line length above SAST_MINIFIED_LINE_LENGTH).
+3. Reading     - small files are decoded at once; large ones are read through `mmap`
+                 (disk) or the object stream (git) in bounded windows split at line
+                 boundaries, so peak memory stays around SAST_WINDOW_BYTES per file.
+
+Each ingest returns `(alerts, outcome, size)` so the caller can build scan stats.
+"""
+
+import os
+import mmap
+import codecs
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Tuple
+from src.config import settings
+from src.sast_engine import RuleEngine
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SNIFF_BYTES = 8192
+# A single line longer than this many windows is split (keeps memory bounded on minified code)
+MAX_LINE_WINDOWS = 4
+# Context lines shared between adjacent windows (matches the +/- 2 lines of alert context)
+CONTEXT_LINES = 2
+
+# Scan outcomes
+SCANNED = "scanned"
+WINDOWED = "windowed"
+CACHED = "cached"
+BINARY = "binary"
+TOO_LARGE = "too_large"
+MINIFIED = "minified"
+IGNORED = "ignored"  # Excluded by the path filter (see src/path_filter.py)
+ERROR = "error"
+SKIPPED = (BINARY, TOO_LARGE, MINIFIED, IGNORED)
+
+# Minified-code detection needs a reasonably sized sample
+MIN_MINIFIED_SAMPLE = 1024
+
+IngestResult = Tuple[List[Dict[str, Any]], str, int]
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """
+    Guesses the encoding from the first bytes of a file.
+    Returns None for binary content (NUL bytes without a UTF-16/32 BOM).
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)):
+        return "utf-32"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    if b"\x00" in head:
+        return None
+
+    try:
+        # final=False: a multi-byte sequence cut at the sniff boundary is not an error
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def is_minified(head: bytes) -> bool:
+    """Heuristic: average line length of the sniffed sample above SAST_MINIFIED_LINE_LENGTH."""
+    threshold = settings.SAST_MINIFIED_LINE_LENGTH
+    if threshold <= 0 or len(head) < MIN_MINIFIED_SAMPLE:
+        return False
+    return len(head) / (head.count(b"\n") + 1) > threshold
+
+
+def _line_aligned(encoding: str) -> bool:
+    """True when b'\\n' can only ever be a newline (safe to split windows on raw bytes)."""
+    return not encoding.startswith(("utf-16", "utf-32"))
+
+
+def iter_mmap_blocks(path: str, window_bytes: int) -> Iterator[bytes]:
+    """Yields blocks of whole lines (each about `window_bytes`) from a memory-mapped file."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        pos = 0
+        while pos < size:
+            end = min(pos + window_bytes, size)
+            if end < size:
+                cut = mm.rfind(b"\n", pos, end)
+                if cut == -1:
+                    # Line longer than a window: extend to its end (bounded)
+                    limit = min(pos + window_bytes * MAX_LINE_WINDOWS, size)
+                    cut = mm.find(b"\n", end, limit)
+                    if cut == -1:
+                        cut = limit - 1
+                end = cut + 1
+            yield mm[pos:end]
+            pos = end
+
+
+def iter_stream_blocks(stream, head: bytes, window_bytes: int) -> Iterator[bytes]:
+    """Same as `iter_mmap_blocks` for a sequential stream (e.g. a git blob stream)."""
+    carry = head
+    while True:
+        chunk = stream.read(window_bytes)
+        data = carry + chunk
+        if not chunk:
+            if data:
+                yield data
+            return
+
+        cut = data.rfind(b"\n")
+        if cut == -1:
+            if len(data) < window_bytes * MAX_LINE_WINDOWS:
+                carry = data
+                continue
+            cut = len(data) - 1
+        yield data[:cut + 1]
+        carry = data[cut + 1:]
+
+
+def scan_windows(
+    engine: RuleEngine,
+    blocks: Iterable[bytes],
+    encoding: str,
+    filename: str,
+    line_ranges: Optional[List[Tuple[int, int]]] = None,
+    line_numbers: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Scans a file block by block. Each window is the block's own lines plus
+    CONTEXT_LINES of overlap on both sides (for alert context only); rules are
+    evaluated on the own lines, and line numbers are reported file-globally.
+    """
+    alerts = []
+    blocks = iter(blocks)
+    current = next(blocks, None)
+    prev_tail: List[str] = []
+    first_line = 0  # 0-based file line of the current block's first line
+
+    while current is not None:
+        following = next(blocks, None)
+        # A block split inside an over-long line ends without a newline: its last line
+        # continues in the next block, which therefore starts on that same line number
+        complete = current.endswith(b"\n")
+        if following is not None and complete:
+            current = current[:-1]
+        own = current.decode(encoding, errors="ignore").split("\n")
+
+        next_head: List[str] = []
+        if following is not None:
+            cut = -1
+            for _ in range(CONTEXT_LINES):
+                cut = following.find(b"\n", cut + 1)
+                if cut == -1:
+                    break
+            head = following if cut == -1 else following[:cut]
+            next_head = head.decode(encoding, errors="ignore").split("\n")[:CONTEXT_LINES]
+
+        offset = first_line - len(prev_tail)
+        own_first, own_last = first_line + 1, first_line + len(own)
+        if line_ranges is None:
+            window_ranges = [(own_first - offset, own_last - offset)]
+        else:
+            window_ranges = [
+                (max(first, own_first) - offset, min(last, own_last) - offset)
+                for first, last in line_ranges
+                if first <= own_last and last >= own_first
+            ]
+
+        if window_ranges:
+            alerts.extend(engine.scan(
+                "\n".join(prev_tail + own + next_head),
+                filename=filename,
+                line_ranges=window_ranges,
+                line_numbers=line_numbers,
+                line_offset=offset
+            ))
+
+        prev_tail = (prev_tail + own)[-CONTEXT_LINES:]
+        first_line += len(own) if complete else len(own) - 1
+        current = following
+
+    return alerts
+
+
+def _scan_large_mode() -> bool:
+    return settings.SAST_LARGE_FILE_MODE == "window"
+
+
+def ingest_file(engine: RuleEngine, file_path: str, **scan_kwargs) -> IngestResult:
+    """Sniffs, reads (whole or windowed) and scans a file on disk."""
+    file = os.path.basename(file_path)
+    size = 0
+    try:
+        size = os.path.getsize(file_path)
+        too_large = size > settings.SAST_MAX_FILE_BYTES
+        if too_large and not _scan_large_mode():
+            return [], TOO_LARGE, size
+
+        with open(file_path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+            encoding = sniff(head)
+            if encoding is None:
+                return [], BINARY, size
+            if is_minified(head):
+                return [], MINIFIED, size
+
+            if not too_large:
+                content = (head + f.read()).decode(encoding, errors="ignore")
+                return engine.scan(content, filename=file, **scan_kwargs), SCANNED, size
+
+        if not _line_aligned(encoding):
+            return [], TOO_LARGE, size
+        blocks = iter_mmap_blocks(file_path, settings.SAST_WINDOW_BYTES)
+        return scan_windows(engine, blocks, encoding, file, **scan_kwargs), WINDOWED, size
+
+    except Exception as read_err:
+        print(f"⚠️ Failed to read {file}: {read_err}")
+        return [], ERROR, size
+
+
+def ingest_blob(engine: RuleEngine, repo, blob_sha: str, file_path: str, **scan_kwargs) -> IngestResult:
+    """Same as `ingest_file` for a blob read straight from the git object database."""
+    file = os.path.basename(file_path)
+    size = 0
+    try:
+        binsha = bytes.fromhex(blob_sha)
+        size = repo.odb.info(binsha).size
+        too_large = size > settings.SAST_MAX_FILE_BYTES
+        if too_large and not _scan_large_mode():
+            return [], TOO_LARGE, size
+
+        stream = repo.odb.stream(binsha)
+        head = stream.read(SNIFF_BYTES)
+        encoding = sniff(head)
+        if encoding is None:
+            outcome = BINARY
+        elif is_minified(head):
+            outcome = MINIFIED
+        elif too_large and not _line_aligned(encoding):
+            outcome = TOO_LARGE
+        else:
+            outcome = None
+        if outcome is not None:
+            _drain(stream)
+            return [], outcome, size
+
+        if not too_large:
+            content = (head + stream.read()).decode(encoding, errors="ignore")
+            return engine.scan(content, filename=file, **scan_kwargs), SCANNED, size
+
+        blocks = iter_stream_blocks(stream, head, settings.SAST_WINDOW_BYTES)
+        return scan_windows(engine, blocks, encoding, file, **scan_kwargs), WINDOWED, size
+
+    except Exception as read_err:
+        print(f"⚠️ Failed to read {file}: {read_err}")
+        return [], ERROR, size
+
+
+def _drain(stream):
+    """Consumes the rest of a git object stream (keeps the persistent cat-file pipe in sync)."""
+    while stream.read(1024 * 1024):
+        pass
+
+
+# --- Scan Stats ---
+class ScanStats:
+    """
+    Per-scan counters: outcomes, pruned dirs, bytes scanned/skipped, plus memory figures:
+    - rss_mb / rss_growth_mb: this process now, and the change since the scan started
+    - peak_rss_mb: peak RSS during this scan, the maximum of this process (its high-water
+      mark is reset when the scan starts) and of the pool workers (reset per chunk, see
+      `scan_files`). None where the high-water mark cannot be reset (non-Linux).
+      Concurrent scans in one process share its high-water mark: a scan starting later
+      resets it for the others too.
+    """
+    def __init__(self):
+        self.files = {}
+        self.dirs_pruned = 0
+        self.bytes_scanned = 0
+        self.bytes_skipped = 0
+        self.start_rss = current_rss_bytes()
+        self.peak_reset = reset_peak_rss()
+        self.worker_peak_rss = 0
+
+    def record_worker_peak(self, peak_bytes: int):
+        self.worker_peak_rss = max(self.worker_peak_rss, peak_bytes)
+
+    def record(self, outcome: str, size: int):
+        self.files[outcome] = self.files.get(outcome, 0) + 1
+        if outcome in (SCANNED, WINDOWED):
+            self.bytes_scanned += size
+        elif outcome in SKIPPED:
+            self.bytes_skipped += size
+
+    def as_dict(self) -> Dict[str, Any]:
+        rss = current_rss_bytes()
+        return {
+            "files": dict(self.files),
+            "dirs_pruned": self.dirs_pruned,
+            "bytes_scanned": self.bytes_scanned,
+            "bytes_skipped": self.bytes_skipped,
+            "rss_mb": round(rss / 1e6, 1),
+            "rss_growth_mb": round((rss - self.start_rss) / 1e6, 1),
+            "peak_rss_mb": round(max(peak_rss_bytes(), self.worker_peak_rss) / 1e6, 1) if self.peak_reset else None
+        }
+
+
+def _status_bytes(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_bytes() -> int:
+    """Current RSS of this process (0 where /proc is unavailable)."""
+    return _status_bytes("VmRSS") or 0
+
+
+def peak_rss_bytes() -> int:
+    """Peak RSS of this process since the last `reset_peak_rss` (else its lifetime peak)."""
+    peak = _status_bytes("VmHWM")
+    if peak is not None:
+        return peak
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def reset_peak_rss() -> bool:
+    """Resets this process's RSS high-water mark (VmHWM) to its current RSS; False if unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+# --- Process Pool Workers ---
+# Each worker builds its own RuleEngine once (via the pool initializer) instead of
+# receiving the compiled rule set with every task. A scan item is either a file
+# path on disk or a `(blob_sha, path)` pair read from the worker's git repository.
+_worker_engine: Optional[RuleEngine] = None
+_worker_repo = None
+
+
+def init_worker(rules: List[Dict[str, Any]], repo_path: Optional[str] = None):
+    """ProcessPoolExecutor initializer: compile the rule set (and open the repo) once per worker."""
+    global _worker_engine, _worker_repo
+    _worker_engine = RuleEngine(rules)
+    if repo_path:
+        from git import Repo
+        _worker_repo = Repo(repo_path)
+
+
+def scan_item(engine: RuleEngine, repo, item) -> IngestResult:
+    if isinstance(item, tuple):
+        return ingest_blob(engine, repo, *item)
+    return ingest_file(engine, item)
+
+
+def scan_files(items: List[Any]) -> Tuple[List[IngestResult], int]:
+    """
+    Worker task: scans a chunk of items, returning results per item in input order
+    and the worker's peak RSS while scanning them (0 if it cannot be measured per chunk).
+    """
+    reset = reset_peak_rss()
+    results = [scan_item(_worker_engine, _worker_repo, item) for item in items]
+    return results, peak_rss_bytes() if reset else 0
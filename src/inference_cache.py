@@ -0,0 +1,133 @@
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+from src.config import settings
+from src.scan_cache import MongoCacheTier
+
+# String literals are kept verbatim: whitespace inside them is significant
+_STRING_TOKENS = re.compile(
+    r'"""[\s\S]*?"""'              # """triple-quoted"""
+    r"|'''[\s\S]*?'''"
+    r'|"(?:\\.|[^"\\\n])*"'        # "double-quoted"
+    r"|'(?:\\.|[^'\\\n])*'"        # 'single-quoted'
+    r"|`(?:\\.|[^`\\])*`"          # `template literal`
+)
+_INLINE_SPACE = re.compile(r"(?<=\S)[ \t]+")
+
+
+def normalize_code(code: str) -> str:
+    """
+    Cache-key normalization, whitespace only: drops trailing whitespace and blank lines
+    and collapses whitespace runs inside a line, outside string literals. Leading
+    indentation is kept (it is significant in Python). Comments are *not* stripped:
+    the language is unknown here, and a marker that starts a comment in one language
+    is an operator in another (`//` in Python, `#` in C), so stripping could make
+    different code share a key.
+    """
+    if "\0" in code:
+        return code  # Placeholders below could collide; key on the exact code
+    literals = []
+
+    def hide(match: "re.Match") -> str:
+        literals.append(match.group(0))
+        return f"\0{len(literals) - 1}\0"
+
+    hidden = _STRING_TOKENS.sub(hide, code)
+    lines = []
+    for line in hidden.split("\n"):
+        line = _INLINE_SPACE.sub(" ", line.rstrip())
+        if line.strip():
+            lines.append(line)
+    return re.sub(r"\0(\d+)\0", lambda m: literals[int(m.group(1))], "\n".join(lines))
+
+
+class InferenceCache:
+    """
+    Two-tier cache of model outputs (ExpertModel.verify / repair).
+
+    Key: sha256(task, model version, normalized code). The model version is derived
+    from the loaded weights and tokenizer (see `ExpertModel.model_versions`), so a new model
+    invalidates every entry without any explicit flush. Results that depend on the
+    exact layout (line numbers of windowed verify) are keyed on the raw code instead.
+
+    Tiers:
+    1. In-process LRU (`max_entries`).
+    2. Optional MongoDB collection with a TTL index (`remote`); hits are promoted to tier 1.
+    """
+    def __init__(self, max_entries: int, remote: Optional[MongoCacheTier] = None):
+        self.max_entries = max_entries
+        self.remote = remote
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls) -> "InferenceCache":
+        remote = None
+        if settings.INFERENCE_CACHE_MONGO:
+            remote = MongoCacheTier(settings.INFERENCE_CACHE_COLLECTION, settings.INFERENCE_CACHE_TTL_DAYS, field="result")
+        return cls(settings.INFERENCE_CACHE_MAX_ENTRIES, remote=remote)
+
+    @staticmethod
+    def make_key(task: str, model_version: str, code: str, exact: bool = False, **params) -> str:
+        body = code if exact else normalize_code(code)
+        header = json.dumps([task, model_version, exact, params], sort_keys=True)
+        return hashlib.sha256(f"{header}\0{body}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        found: Dict[str, Any] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        local = len(found)
+
+        if self.remote is not None:
+            missing = [key for key in keys if key not in found]
+            remote_found = self.remote.get_many(missing)
+            if remote_found:
+                self._put_local(remote_found)
+                found.update(remote_found)
+
+        self.hits += local
+        self.remote_hits += len(found) - local
+        self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, entries: Dict[str, Any]):
+        if not entries:
+            return
+        self._put_local(entries)
+        if self.remote is not None:
+            self.remote.put_many(entries)
+
+    def put(self, key: str, value: Any):
+        self.put_many({key: value})
+
+    def _put_local(self, entries: Dict[str, Any]):
+        with self._lock:
+            for key, value in entries.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.remote_hits + self.misses
+        return {
+            "hits": self.hits,
+            "remote_hits": self.remote_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.remote_hits) / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries)
+        }
@@ -0,0 +1,219 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, List, Tuple
+from git import Repo
+from src.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+# Clone / fetch attempts when the mirror is evicted while the lock is being downgraded
+SYNC_ATTEMPTS = 3
+# Refs kept in a mirror: branches and tags only. `--mirror`'s +refs/*:refs/* would also
+# fetch every refs/pull/* head on GitHub, on clone and on every fetch.
+FETCH_REFSPECS = ("+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*")
+
+
+class _MirrorLock:
+    """
+    Reader/writer lock for one mirror, shared across threads and processes.
+    - Exclusive: clone / fetch / eviction.
+    - Shared: reading objects during a scan (keeps eviction away).
+    Uses `flock` on a lock file next to the mirror; without fcntl it degrades to a
+    process-local exclusive lock.
+    """
+    _local_locks = {}
+    _local_guard = threading.Lock()
+
+    def __init__(self, lock_path: str):
+        self.lock_path = lock_path
+        self._fd = None
+        self._local = None
+
+    def acquire(self, exclusive: bool = True, blocking: bool = True) -> bool:
+        if fcntl is None:
+            with self._local_guard:
+                self._local = self._local_locks.setdefault(self.lock_path, threading.RLock())
+            return self._local.acquire(blocking)
+
+        self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(self._fd, flags)
+            return True
+        except BlockingIOError:
+            os.close(self._fd)
+            self._fd = None
+            return False
+
+    def downgrade(self):
+        """
+        Exclusive -> shared. Not atomic: flock(2) removes the existing lock before
+        placing the new one, so another process can take the exclusive lock in
+        between (callers must re-check what they locked, see `MirrorCache.mirror`).
+        """
+        if fcntl is not None and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        if self._local is not None:
+            self._local.release()
+            self._local = None
+
+
+class MirrorCache:
+    """
+    Managed cache of bare git mirrors (one per repository URL).
+
+    - First use: `git clone --bare` into the cache directory, fetching branches and
+      tags only (FETCH_REFSPECS).
+    - Later uses: incremental `git fetch --prune` instead of a fresh clone. If the
+      fetch fails, the existing mirror is used as is (with a warning).
+    - Concurrent scans of the same repo share a single fetch: a caller that waited
+      on the lock skips its own fetch if another one finished after it arrived.
+    - Files are read straight from the object database (no working-tree checkout).
+    - Size-based LRU eviction keeps the cache under `max_bytes`.
+    """
+    FETCH_STAMP = "redeye_fetched"
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = os.path.expanduser(root)
+        self.max_bytes = max_bytes
+
+    def path_for(self, repo_url: str) -> str:
+        key = hashlib.sha256(repo_url.encode("utf-8")).hexdigest()[:24]
+        return os.path.join(self.root, f"{key}.git")
+
+    @contextmanager
+    def mirror(self, repo_url: str) -> Iterator[Repo]:
+        """
+        Yields an up-to-date bare mirror of `repo_url`.
+        The mirror cannot be evicted while the context is open.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path_for(repo_url)
+        lock = _MirrorLock(f"{path}.lock")
+        requested_at = time.time()
+
+        for _ in range(SYNC_ATTEMPTS):
+            lock.acquire(exclusive=True)
+            try:
+                self._sync(repo_url, path, requested_at)
+            except BaseException:
+                lock.release()
+                raise
+            lock.downgrade()
+            # `evict` may have taken the lock while it was being downgraded; it renames
+            # the mirror away before deleting it, so the path is either whole or gone
+            if os.path.isdir(path):
+                break
+            lock.release()
+            print(f"🪞 [Mirror] {repo_url} was evicted during lock downgrade; syncing again")
+        else:
+            raise RuntimeError(f"Mirror of {repo_url} kept being evicted ({SYNC_ATTEMPTS} attempts)")
+
+        try:
+            os.utime(path)  # LRU stamp
+            repo = Repo(path)
+            try:
+                yield repo
+            finally:
+                repo.close()
+        finally:
+            lock.release()
+
+        self.evict(keep=path)
+
+    def _sync(self, repo_url: str, path: str, requested_at: float):
+        stamp = os.path.join(path, self.FETCH_STAMP)
+
+        if os.path.isdir(path) and Repo(path).git.config("--get", "remote.origin.mirror", with_exceptions=False) == "true":
+            # Cloned with --mirror (all refs, refs/pull/* included): replace it once
+            print(f"🪞 [Mirror] Re-cloning {repo_url} without pull request refs")
+            shutil.rmtree(path, ignore_errors=True)
+
+        if not os.path.isdir(path):
+            print(f"🪞 [Mirror] Cloning {repo_url}...")
+            try:
+                repo = Repo.clone_from(repo_url, path, bare=True)
+                repo.git.config("--replace-all", "remote.origin.fetch", FETCH_REFSPECS[0])
+                for refspec in FETCH_REFSPECS[1:]:
+                    repo.git.config("--add", "remote.origin.fetch", refspec)
+            except Exception:
+                shutil.rmtree(path, ignore_errors=True)  # Never keep a half-cloned mirror
+                raise
+        elif os.path.exists(stamp) and os.path.getmtime(stamp) >= requested_at:
+            # Another scan fetched while we were waiting on the lock
+            print(f"🪞 [Mirror] Reusing concurrent fetch for {repo_url}")
+            return
+        else:
+            print(f"🪞 [Mirror] Fetching updates for {repo_url}...")
+            try:
+                Repo(path).git.fetch("--prune", "origin")
+            except Exception as e:
+                # Stale beats failing the scan; the stamp is not updated so the next scan retries
+                print(f"⚠️ [Mirror] Fetch failed for {repo_url}, scanning the existing mirror: {e}")
+                return
+
+        with open(stamp, "w") as f:
+            f.write(str(time.time()))
+
+    def evict(self, keep: Optional[str] = None):
+        """Removes least recently used mirrors until the cache fits in `max_bytes`."""
+        mirrors: List[Tuple[float, int, str]] = []
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith(".git") and os.path.isdir(path):
+                mirrors.append((os.path.getmtime(path), _dir_size(path), path))
+
+        total = sum(size for _, size, _ in mirrors)
+        for _, size, path in sorted(mirrors):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+
+            lock = _MirrorLock(f"{path}.lock")
+            if not lock.acquire(exclusive=True, blocking=False):
+                continue  # In use by a scan or fetch
+            try:
+                # Rename first so a reader that re-checks the path never sees a partial mirror
+                doomed = f"{path}.evicted-{os.getpid()}-{threading.get_ident()}"
+                try:
+                    os.rename(path, doomed)
+                except OSError:
+                    continue
+                shutil.rmtree(doomed, ignore_errors=True)
+                total -= size
+                print(f"🧹 [Mirror] Evicted {os.path.basename(path)} ({size / 1e6:.1f} MB)")
+            finally:
+                lock.release()
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for current, _dirs, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(current, file))
+            except OSError:
+                pass
+    return total
+
+
+mirror_cache = MirrorCache(settings.MIRROR_CACHE_DIR, settings.MIRROR_CACHE_MAX_BYTES)
@@ -0,0 +1,159 @@
+"""
+Pre-quantized int8 model artifacts for fast cold starts.
+
+Layout of an artifact directory:
+- model.int8.safetensors : int8 weights + scale / zero-point of every dynamically quantized
+                           Linear layer, plus the remaining float tensors (embeddings, norms)
+- config.json + tokenizer files (no network access needed at load time)
+
+Loading skips everything the legacy path pays for: random weight init (`no_init_weights`),
+`torch.load` of a pickle, and downloading config/tokenizer from the hub. The file is
+memory-mapped (private, copy-on-write), so float tensors are used in place without a copy
+and their pages are shared between processes; only the int8 Linear weights are re-packed.
+"""
+
+import os
+import json
+import mmap
+from typing import Any, Dict, Optional, Tuple
+import torch
+from transformers import AutoConfig, AutoTokenizer
+from transformers.modeling_utils import no_init_weights
+
+ARTIFACT_FILE = "model.int8.safetensors"
+ARTIFACT_FORMAT = "redeye-int8-v1"
+
+_DTYPES = {
+    "F64": torch.float64, "F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+    "I64": torch.int64, "I32": torch.int32, "I16": torch.int16, "I8": torch.int8,
+    "U8": torch.uint8, "BOOL": torch.bool,
+}
+
+
+def save_int8_artifact(model: Any, tokenizer: Any, output_dir: str):
+    """Writes a dynamically quantized model (see `ExpertModel._load_quantized_model`) as an artifact dir."""
+    from safetensors.torch import save_file
+
+    tensors: Dict[str, torch.Tensor] = {}
+    quantized = []
+    for name, module in model.named_modules():
+        if not hasattr(module, "_packed_params"):
+            continue
+        weight = module.weight()
+        tensors[f"{name}.weight.int8"] = weight.int_repr().contiguous()
+        if weight.qscheme() in (torch.per_tensor_affine, torch.per_tensor_symmetric):
+            tensors[f"{name}.weight.scale"] = torch.tensor([weight.q_scale()], dtype=torch.float64)
+            tensors[f"{name}.weight.zero_point"] = torch.tensor([weight.q_zero_point()], dtype=torch.int64)
+            axis = None
+        else:
+            tensors[f"{name}.weight.scale"] = weight.q_per_channel_scales().to(torch.float64).contiguous()
+            tensors[f"{name}.weight.zero_point"] = weight.q_per_channel_zero_points().to(torch.int64).contiguous()
+            axis = weight.q_per_channel_axis()
+        if module.bias() is not None:
+            tensors[f"{name}.bias"] = module.bias().detach().contiguous()
+        quantized.append({"name": name, "axis": axis})
+
+    # Float tensors; tied weights (same storage) are stored once
+    quantized_names = {entry["name"] for entry in quantized}
+    seen = set()
+    for key, value in model.state_dict().items():
+        if key.rpartition(".")[0] in quantized_names or "_packed_params" in key:
+            continue  # Output scale / packed params of the quantized Linear layers
+        if not isinstance(value, torch.Tensor) or value.is_quantized:
+            continue
+        if value.data_ptr() in seen:
+            continue
+        seen.add(value.data_ptr())
+        tensors[key] = value.detach().contiguous()
+
+    os.makedirs(output_dir, exist_ok=True)
+    save_file(tensors, os.path.join(output_dir, ARTIFACT_FILE), metadata={
+        "format": ARTIFACT_FORMAT,
+        "quantized": json.dumps(quantized)
+    })
+    model.config.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+
+
+def find_int8_artifact(model_name_or_path: str, hf_token: Optional[str] = None) -> Optional[str]:
+    """Local directory of the artifact for a path or HF repo id (None if it has none)."""
+    if os.path.isdir(model_name_or_path):
+        return model_name_or_path if os.path.exists(os.path.join(model_name_or_path, ARTIFACT_FILE)) else None
+
+    try:
+        from huggingface_hub import hf_hub_download, snapshot_download
+        hf_hub_download(repo_id=model_name_or_path, filename=ARTIFACT_FILE, token=hf_token)
+        return snapshot_download(
+            repo_id=model_name_or_path,
+            allow_patterns=[ARTIFACT_FILE, "*.json", "*.txt", "*.model"],
+            token=hf_token
+        )
+    except Exception:
+        return None  # Repo only has the legacy pickle
+
+
+def load_int8_artifact(model_class: Any, artifact_dir: str) -> Tuple[Any, Any]:
+    """Builds the quantized model structure and fills it from the memory-mapped artifact."""
+    tensors, metadata = _mmap_safetensors(os.path.join(artifact_dir, ARTIFACT_FILE))
+    if metadata.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported artifact format: {metadata.get('format')}")
+
+    config = AutoConfig.from_pretrained(artifact_dir)
+    tokenizer = AutoTokenizer.from_pretrained(artifact_dir)
+
+    # Structure only: random init is skipped, every tensor is overwritten below
+    with no_init_weights():
+        if "AutoModel" in model_class.__name__:
+            model = model_class.from_config(config)
+        else:
+            model = model_class(config)
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    for entry in json.loads(metadata["quantized"]):
+        name = entry["name"]
+        int_repr = tensors.pop(f"{name}.weight.int8")
+        scale = tensors.pop(f"{name}.weight.scale")
+        zero_point = tensors.pop(f"{name}.weight.zero_point")
+        if entry["axis"] is None:
+            weight = torch._make_per_tensor_quantized_tensor(int_repr, scale.item(), int(zero_point.item()))
+        else:
+            weight = torch._make_per_channel_quantized_tensor(int_repr, scale, zero_point, entry["axis"])
+        model.get_submodule(name).set_weight_bias(weight, tensors.pop(f"{name}.bias", None))
+
+    # Remaining float tensors are assigned in place (no copy out of the mapping).
+    # Not via load_state_dict: quantized modules expect their packed params in the same dict.
+    for key, tensor in tensors.items():
+        module_name, _, attr = key.rpartition(".")
+        module = model.get_submodule(module_name)
+        if attr in module._parameters:
+            module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+        elif attr in module._buffers:
+            module._buffers[attr] = tensor
+        else:
+            raise ValueError(f"Unexpected tensor in artifact: {key}")
+    model.eval()
+    return model, tokenizer
+
+
+def _mmap_safetensors(path: str) -> Tuple[Dict[str, torch.Tensor], Dict[str, str]]:
+    """
+    Zero-copy safetensors reader: tensors are views into a private (copy-on-write) mapping
+    of the file, so nothing is read until touched and untouched pages stay shared.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header_len = int.from_bytes(mm[:8], "little")
+    header = json.loads(mm[8:8 + header_len])
+    data_start = 8 + header_len
+
+    metadata = header.pop("__metadata__", {}) or {}
+    tensors = {}
+    for name, info in header.items():
+        dtype = _DTYPES[info["dtype"]]
+        begin, end = info["data_offsets"]
+        count = (end - begin) // torch.empty(0, dtype=dtype).element_size()
+        if count == 0:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        tensors[name] = torch.frombuffer(mm, dtype=dtype, count=count, offset=data_start + begin).view(info["shape"])
+    return tensors, metadata
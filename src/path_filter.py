@@ -0,0 +1,203 @@
+"""
+Path filtering for the SAST repository walker.
+
+Rules come from (lowest to highest precedence):
+1. DEFAULT_EXCLUDES - vendored deps, build output, lockfiles, minified bundles.
+2. `.gitignore` files, then `.redeyeignore` files, per directory from the root down.
+   `.gitignore` only applies to working-directory walks: git never applies ignore
+   rules to tracked files, so scans of a git tree (whole tree or commit range) use
+   `.redeyeignore` only (TRACKED_IGNORE_FILES). A committed `.env` or key file that
+   is also listed in `.gitignore` is scanned.
+
+Syntax and precedence follow gitignore: the last matching rule wins, `!pattern`
+re-includes, `dir/` only matches directories, patterns containing a slash are
+anchored to the directory of the ignore file, and `**` spans directories.
+Ignored directories are pruned before descending, so nothing under them can be
+re-included (same as git).
+"""
+
+import re
+from typing import List, Optional, Iterable, Callable, Dict
+from src.config import settings
+
+
+IGNORE_FILES = (".gitignore", ".redeyeignore")
+TRACKED_IGNORE_FILES = (".redeyeignore",)
+
+DEFAULT_EXCLUDES = [
+    # VCS / tooling
+    ".git/", ".hg/", ".svn/", ".idea/", ".vscode/",
+    # Dependencies
+    # (generic names are anchored to the repo root so source dirs like src/build/ are scanned)
+    "node_modules/", "bower_components/", "jspm_packages/", "/vendor/", "third_party/",
+    ".venv/", "venv/", "site-packages/", "__pycache__/",
+    # Build output
+    "dist/", "/build/", "/out/", "/target/", ".next/", ".nuxt/", "coverage/",
+    # Lockfiles
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "composer.lock", "Gemfile.lock",
+    "poetry.lock", "Pipfile.lock", "Cargo.lock", "go.sum", "uv.lock",
+    # Minified / bundled / generated
+    "*.min.js", "*.min.css", "*.bundle.js", "*.chunk.js", "*.map", "*.pb.go", "*_pb2.py",
+]
+
+
+class IgnoreRule:
+    """One gitignore-style pattern, relative to the directory of its ignore file (`base`)."""
+    def __init__(self, pattern: str, base: str = ""):
+        self.base = base.strip("/")
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        elif pattern.startswith(("\\!", "\\#")):
+            pattern = pattern[1:]
+
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+
+        body = _translate(pattern)
+        self.regex = re.compile(body if anchored else f"(?:.*/)?{body}", re.DOTALL)
+
+    def matches(self, path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not path.startswith(self.base + "/"):
+                return False
+            path = path[len(self.base) + 1:]
+        return self.regex.fullmatch(path) is not None
+
+
+def _translate(pattern: str) -> str:
+    """Translates a gitignore glob into a regex (`*` and `?` never cross `/`)."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape("["))
+                i += 1
+                continue
+            chars = pattern[i + 1:end]
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            out.append(f"[{chars}]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+def parse_ignore_lines(lines: Iterable[str], base: str = "") -> List[IgnoreRule]:
+    rules = []
+    for line in lines:
+        line = line.rstrip("\n").rstrip("\r")
+        # Trailing spaces are ignored unless escaped
+        stripped = line.rstrip(" ")
+        if stripped.endswith("\\") and len(stripped) < len(line):
+            stripped += " "
+        if not stripped or stripped.startswith("#"):
+            continue
+        try:
+            rules.append(IgnoreRule(stripped, base))
+        except re.error:
+            continue  # Malformed pattern: ignore it like git does
+    return rules
+
+
+class PathFilter:
+    """Ordered rule list; `extend` returns a new filter for a subdirectory."""
+    def __init__(self, rules: Optional[List[IgnoreRule]] = None):
+        self.rules = rules or []
+
+    @classmethod
+    def default(cls) -> "PathFilter":
+        return cls(parse_ignore_lines(DEFAULT_EXCLUDES) if settings.SAST_USE_DEFAULT_EXCLUDES else [])
+
+    def extend(
+        self,
+        base: str,
+        read_file: Callable[[str], Optional[str]],
+        names: Iterable[str] = IGNORE_FILES
+    ) -> "PathFilter":
+        """
+        Adds the ignore files `names` of directory `base` (repo-relative, "" for the root).
+        `read_file(name)` returns the content of that file in `base`, or None.
+        """
+        if not settings.SAST_RESPECT_IGNORE_FILES:
+            return self
+        added = []
+        for name in names:
+            content = read_file(name)
+            if content:
+                added.extend(parse_ignore_lines(content.splitlines(), base))
+        return PathFilter(self.rules + added) if added else self
+
+    def is_ignored(self, path: str, is_dir: bool = False) -> bool:
+        ignored = False
+        for rule in self.rules:
+            if rule.negate == ignored and rule.matches(path, is_dir):
+                ignored = not rule.negate
+        return ignored
+
+
+class TreePathFilter:
+    """
+    Resolves ignore rules for arbitrary paths of one git tree, lazily loading the
+    ignore files of each ancestor directory (used when files are not visited by a walk,
+    e.g. the changed files of a commit range). Tracked files: `.redeyeignore` only.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self._filters: Dict[str, PathFilter] = {}
+
+    def _filter_for(self, directory: str) -> PathFilter:
+        if directory not in self._filters:
+            if directory:
+                parent = directory.rpartition("/")[0]
+                base_filter = self._filter_for(parent)
+                subtree = self.tree / directory
+            else:
+                base_filter = PathFilter.default()
+                subtree = self.tree
+            self._filters[directory] = base_filter.extend(
+                directory, lambda name: read_tree_file(subtree, name), TRACKED_IGNORE_FILES
+            )
+        return self._filters[directory]
+
+    def is_ignored(self, path: str) -> bool:
+        parts = path.split("/")
+        for depth in range(1, len(parts)):
+            directory = "/".join(parts[:depth])
+            if self._filter_for("/".join(parts[:depth - 1])).is_ignored(directory, is_dir=True):
+                return True
+        return self._filter_for("/".join(parts[:-1])).is_ignored(path)
+
+
+def read_tree_file(tree, name: str) -> Optional[str]:
+    """Content of blob `name` directly inside a git tree (None if absent)."""
+    try:
+        blob = tree / name
+    except KeyError:
+        return None
+    if blob.type != "blob":
+        return None
+    return blob.data_stream.read().decode("utf-8", errors="ignore")
@@ -0,0 +1,214 @@
+"""
+Pre-fork serving: load + warm up the models once, then fork uvicorn workers.
+
+    python -m src.prefork --workers 4 [--host 0.0.0.0] [--port 8000]
+
+Plain `uvicorn --workers N` starts N fresh interpreters, and each lazily loads its own
+copy of both quantized models. Here the parent process imports the app, loads and warms
+up the active model version, freezes the GC and binds the listening socket; the forked
+workers inherit the loaded weights as copy-on-write pages, so the weights are resident
+once instead of once per worker. Workers accept on the shared socket.
+
+Fork safety:
+- Nothing that starts threads or opens connections runs in the parent: MongoDB, the
+  inference executor and background tasks start in each worker's lifespan.
+- Warm-up runs with a single torch thread so no OpenMP pool exists at fork time; each
+  worker sizes its own pool (cores // (workers x INFERENCE_WORKERS) unless configured).
+- `gc.freeze()` moves every object created so far out of the collector's reach, so
+  collections in the workers do not write to (and un-share) the parent's pages.
+
+Model registry: every worker has its own copy of `model_registry`, and an HTTP request
+reaches only the worker that accepted it, so /models/registry stage / rollout / promote /
+abort would leave workers serving different versions (and a staged version would be a
+private, unshared copy). The registry is therefore read-only in pre-fork mode (those
+endpoints return 409); roll out a new version by restarting with new model paths
+(DETECTION_MODEL_PATH / REPAIR_MODEL_PATH, or the ONNX paths).
+
+Model memory governor: the preloaded models are pinned in `model_manager`, so
+MODEL_IDLE_TTL_SECONDS / MODEL_MEMORY_BUDGET_MB never evict them in a worker. Evicting
+would free nothing (the parent keeps the pages) and the lazy reload would build a private
+copy in every worker. A model that was not preloaded is loaded (and governed) per worker.
+
+Per-worker memory (RSS / PSS / USS) is printed once the workers are up and is available
+from each worker at GET /metrics/models.
+"""
+
+import gc
+import os
+import sys
+import time
+import socket
+import signal
+import argparse
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Seconds between the fork and the first per-worker memory report
+MEMORY_REPORT_DELAY = 5.0
+# Worker restarts: exponential backoff, reset once a worker stayed up RESTART_STABLE_SECONDS;
+# the parent exits after MAX_RESTARTS consecutive early exits
+RESTART_BACKOFF_INITIAL = 1.0
+RESTART_BACKOFF_MAX = 60.0
+RESTART_STABLE_SECONDS = 60.0
+MAX_RESTARTS = 5
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _preload(workers: int):
+    """Loads + warms up the active model version in the parent (single torch thread)."""
+    import torch
+    from src.config import settings
+    from src.services.inference_executor import inference_executor
+    from src.services.model_manager import model_manager
+    from src.services.model_registry import model_registry
+
+    torch.set_num_threads(1)
+    model_registry.freeze("pre-fork workers each hold their own registry; restart with new model paths to roll out a version")
+    model = model_registry.active_model
+    # The MongoDB cache tier would open a connection in the parent
+    cache, model.cache = model.cache, None
+    try:
+        model.warm_up()
+    finally:
+        model.cache = cache
+    if not model.warmed_up:
+        print(f"⚠️ [Prefork] Models not preloaded ({model.load_error}); workers will load lazily")
+    # Shared copy-on-write with the workers: never evicted (see the module docstring)
+    for name in ("detection", "repair"):
+        if not model_manager.pin(model._managed_name(name), "preloaded before fork"):
+            print(f"⚠️ [Prefork] {name} model not resident after preload; each worker will load its own copy")
+
+    # Executors of all workers share the cores
+    if settings.INFERENCE_TORCH_THREADS <= 0:
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        inference_executor.torch_threads = max(1, cores // (workers * inference_executor.workers))
+
+
+def _run_worker(app, sock: socket.socket, host: str, port: int):
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app, host=host, port=port, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, host: str, port: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app, sock, host, port)
+        except BaseException as e:
+            print(f"❌ [Prefork] Worker {os.getpid()} crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def report_memory(pids) -> Dict[int, Dict[str, int]]:
+    """Prints and returns RSS / PSS / USS per worker (see model_manager.process_memory)."""
+    from src.services.model_manager import process_memory
+
+    report = {pid: process_memory(pid) for pid in pids}
+    for pid, memory in report.items():
+        if memory:
+            print(
+                f"📊 [Prefork] worker {pid}: rss={memory['rss'] / 1e6:7.1f} MB  "
+                f"pss={memory['pss'] / 1e6:7.1f} MB  uss={memory['uss'] / 1e6:7.1f} MB"
+            )
+    return report
+
+
+def serve(workers: int, host: str, port: int, app_path: str = "main:app") -> int:
+    from uvicorn.importer import import_from_string
+
+    app = import_from_string(app_path)
+    _preload(workers)
+    sock = _bind(host, port)
+
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, float] = {}  # pid -> start time
+    for _ in range(workers):
+        children[_spawn(app, sock, host, port)] = time.monotonic()
+    print(f"🚀 [Prefork] {workers} workers on {host}:{port} (pids {sorted(children)})")
+
+    stopping = False
+    exit_code = 0
+    respawn_at: List[float] = []  # Scheduled restarts (backoff)
+    crashes = 0  # Consecutive worker exits within RESTART_STABLE_SECONDS of their start
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    report_at = time.monotonic() + MEMORY_REPORT_DELAY
+    while children or (respawn_at and not stopping):
+        now = time.monotonic()
+        if report_at and now >= report_at:
+            report_memory(sorted(children))
+            report_at = None
+        for due in [t for t in respawn_at if t <= now and not stopping]:
+            respawn_at.remove(due)
+            children[_spawn(app, sock, host, port)] = time.monotonic()
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+        started = children.pop(pid, now)
+        if stopping:
+            continue
+
+        # A worker that crashes on startup (lifespan, MongoDB ...) would crash again
+        # right away: restart with exponential backoff and give up after MAX_RESTARTS
+        crashes = 1 if now - started >= RESTART_STABLE_SECONDS else crashes + 1
+        if crashes > MAX_RESTARTS:
+            print(f"❌ [Prefork] Worker {pid} exited ({status}); {MAX_RESTARTS} restarts failed, shutting down")
+            exit_code = 1
+            stop(None, None)
+            continue
+        delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_INITIAL * 2 ** (crashes - 1))
+        print(f"⚠️ [Prefork] Worker {pid} exited ({status}); restarting in {delay:.1f}s ({crashes}/{MAX_RESTARTS})")
+        respawn_at.append(now + delay)
+    sock.close()
+    return exit_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with pre-forked workers sharing the loaded models")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--app", type=str, default="main:app")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    sys.exit(serve(max(1, args.workers), args.host, args.port, args.app))
+
+
+if __name__ == "__main__":
+    main()
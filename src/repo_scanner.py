@@ -1,18 +1,48 @@
 import os
-import shutil
-import tempfile
 import re
+import asyncio
+import threading
+import multiprocessing
+import concurrent.futures
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from git import Repo
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Callable, Tuple
+from src.config import settings
+from src.sast_engine import RuleEngine
+from src.file_ingest import init_worker, scan_item, scan_files, ingest_blob, ScanStats, IngestResult, SCANNED, WINDOWED, CACHED, IGNORED
+from src.scan_cache import ScanResultCache
+from src.mirror_cache import mirror_cache
+from src.path_filter import PathFilter, TreePathFilter, TRACKED_IGNORE_FILES, read_tree_file
+
+# Files per worker task (amortizes IPC overhead on repos with many small files)
+SCAN_CHUNK_SIZE = 64
+
+# Hunk header of a zero-context diff: @@ -a[,b] +c[,d] @@
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@", re.MULTILINE)
+
+# Ordering of the "risk" field, for thresholds on streaming scans
+RISK_LEVELS = {"Low": 0, "Medium": 1, "High": 2}
+
+# How often a blocked stream producer checks whether its consumer went away
+STREAM_POLL_SECONDS = 0.5
 
 class RepoScanner:
     """
     RepoScanner handles Static Application Security Testing (SAST) using pattern matching.
     It can scan:
-    1. GitHub Repositories (via `scan_repo`) - Clones and scans all files.
+    1. GitHub Repositories (via `scan_repo`) - Syncs a cached mirror and scans all files.
     2. Raw Code Content (via `scan_content`) - Scans a single code snippet (API use).
+    3. Local Directories (via `scan_directory`) - Optionally in parallel across a process pool.
+    4. Commit Ranges (via `scan_range`) - Scans only the hunks changed between two refs.
+
+    `iter_scan_content` / `iter_scan_repo` (and the async `aiter_scan_repo`) stream
+    alerts as they are found instead of building the whole list, and can stop early.
     """
     def __init__(self):
+        # Each rule may also declare "literals": [...] for the RuleEngine prefilter;
+        # when omitted they are derived from the pattern automatically.
         self.vulnerability_patterns = [
             # 1. Hardcoded Secrets (AWS, Generic API Keys)
             {
@@ -50,82 +80,462 @@ class RepoScanner:
                 "description": "Found TODO comment. Check if it indicates incomplete security features."
             }
         ]
+        self._rule_engine: Optional[RuleEngine] = None
+        self._result_cache: Optional[ScanResultCache] = None
+        self._result_cache_error: Optional[str] = None
+        self.last_scan_stats: Dict[str, Any] = {}
+
+    @property
+    def rule_engine(self) -> RuleEngine:
+        """
+        Compiled matcher for `vulnerability_patterns`.
+        Rebuilt automatically whenever the pattern list is modified.
+        """
+        version = RuleEngine.fingerprint(self.vulnerability_patterns)
+        if self._rule_engine is None or self._rule_engine.version != version:
+            self._rule_engine = RuleEngine(self.vulnerability_patterns)
+        return self._rule_engine
+
+    @property
+    def result_cache(self) -> Optional[ScanResultCache]:
+        """
+        Per-file result cache keyed by git blob SHA + rule-set version.
+        None when disabled (SAST_CACHE_ENABLED) or when the store cannot be opened.
+        """
+        if self._result_cache is None and settings.SAST_CACHE_ENABLED and not self._result_cache_error:
+            try:
+                self._result_cache = ScanResultCache.from_settings()
+            except Exception as e:
+                self._result_cache_error = str(e)
+                print(f"⚠️ [SAST Cache] Disabled: {e}")
+        return self._result_cache
 
     def scan_content(self, content: str, filename: str = "snippet") -> List[Dict[str, Any]]:
         """
         Scans a single string of code for vulnerabilities.
         Useful for API endpoints where code is sent directly.
         """
-        alerts = []
-        lines = content.split('\n')
-        
-        for i, line in enumerate(lines):
-            for vuln in self.vulnerability_patterns:
-                if re.search(vuln["pattern"], line):
-                    # Capture Context (+/- 2 lines)
-                    start_line = max(0, i - 2)
-                    end_line = min(len(lines), i + 3)
-                    context_lines = lines[start_line:end_line]
-                    context_snippet = "\n".join(context_lines)
-
-                    alerts.append({
-                        "alert": vuln["label"],
-                        "risk": vuln["risk"],
-                        "description": vuln["description"],
-                        "other": f"File: {filename}:{i+1}\nCode:\n{context_snippet}"[:500] 
-                    })
-        return alerts
-
-    def scan_repo(self, repo_url: str) -> List[Dict[str, Any]]:
-        """
-        Clones the repo to a temp dir, scans files, and returns alerts.
+        return self.rule_engine.scan(content, filename=filename)
+
+    def iter_scan_content(self, content: str, filename: str = "snippet", **limits) -> Iterator[Dict[str, Any]]:
+        """Streaming `scan_content`. Accepts the early-stop `limits` of `limit_alerts`."""
+        return limit_alerts(self.rule_engine.iter_scan(content, filename=filename), **limits)
+
+    def scan_repo(self, repo_url: str, workers: Optional[int] = None, ref: str = "HEAD") -> List[Dict[str, Any]]:
+        """
+        Syncs a cached bare mirror of the repo, scans files at `ref`, and returns alerts.
+        Files are read straight from the git object database (no clone / checkout per scan).
         Legacy method: In RedEye 3.0, n8n handles cloning. This is kept for backward compatibility.
         """
-        print(f"🔍 [SAST] Cloning {repo_url}...")
-        temp_dir = tempfile.mkdtemp()
-        alerts = []
+        return list(self.iter_scan_repo(repo_url, workers=workers, ref=ref))
 
+    def iter_scan_repo(
+        self,
+        repo_url: str,
+        workers: Optional[int] = None,
+        ref: str = "HEAD",
+        **limits
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming `scan_repo`: yields alerts file by file, in the same order.
+        Closing the generator (or hitting a limit, see `limit_alerts`) cancels the
+        chunks still queued in the process pool and releases the mirror.
+        """
+        print(f"🔍 [SAST] Syncing mirror of {repo_url}...")
         try:
-            Repo.clone_from(repo_url, temp_dir, depth=1)
-            
-            # Walk through files
-            for root, dirs, files in os.walk(temp_dir):
-                if ".git" in dirs:
-                    dirs.remove(".git") # Skip .git dir
-                
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    
-                    # Skip binary or non-code files
-                    if not self._is_code_file(file):
-                        continue
-                        
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                            # Use the shared scanning logic
-                            file_alerts = self.scan_content(content, filename=file)
-                            alerts.extend(file_alerts)
-                    except Exception as read_err:
-                        print(f"⚠️ Failed to read {file}: {read_err}")
+            with mirror_cache.mirror(repo_url) as repo:
+                yield from limit_alerts(self.iter_scan_tree(repo, ref=ref, workers=workers), **limits)
 
         except Exception as e:
             print(f"❌ [SAST] Failed to scan repo: {e}")
-            alerts.append({
+            yield {
                 "alert": "Scan Error",
                 "risk": "Low",
                 "description": f"Failed to clone or scan repository: {str(e)}",
                 "other": ""
-            })
+            }
+
+    async def aiter_scan_repo(self, repo_url: str, buffer: Optional[int] = None, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Async `iter_scan_repo` for the event loop. The scan runs in a worker thread and
+        at most `buffer` (settings.SAST_STREAM_BUFFER) alerts wait for the consumer;
+        breaking out of the `async for` stops the scan.
+        """
+        async for alert in iterate_in_thread(
+            lambda: self.iter_scan_repo(repo_url, **kwargs),
+            buffer or settings.SAST_STREAM_BUFFER
+        ):
+            yield alert
+
+    def scan_range(self, repo_url: str, base_ref: str, head_ref: str = "HEAD") -> Dict[str, Any]:
+        """
+        Incremental scan: only the lines changed between `base_ref` and `head_ref`.
+
+        Uses the cached mirror to diff the two commits (zero-context, rename-aware),
+        then evaluates the rules only on the added/modified hunks of each changed file.
+        Line numbers are in head-ref coordinates (the file is read at `head_ref`).
+        Paths excluded by the head-ref `.redeyeignore` files / default excludes are skipped
+        (`.gitignore` never applies to tracked files).
+
+        Returns:
+            {
+                "repository": str,
+                "base": str (resolved SHA),
+                "head": str (resolved SHA, store it as the next `base_ref`),
+                "files_analyzed": int,
+                "lines_analyzed": int,
+                "vulnerabilities": List[Dict],
+                "summary": str
+            }
+        """
+        print(f"🔍 [SAST] Range scan {repo_url} ({base_ref}..{head_ref})")
+        with mirror_cache.mirror(repo_url) as repo:
+            base = repo.commit(base_ref)
+            head = repo.commit(head_ref)
+            engine = self.rule_engine
+
+            vulnerabilities = []
+            stats = ScanStats()
+            path_filter = TreePathFilter(head.tree)
+            files_analyzed = 0
+            lines_analyzed = 0
+            for path, blob_sha, ranges in self._changed_hunks(base, head):
+                if path_filter.is_ignored(path):
+                    stats.record(IGNORED, head.tree[path].size)
+                    continue
+                files_analyzed += 1
+                lines_analyzed += sum(last - first + 1 for first, last in ranges)
+
+                alerts, outcome, size = ingest_blob(engine, repo, blob_sha, path, line_ranges=ranges, line_numbers=True)
+                stats.record(outcome, size)
+                for alert in alerts:
+                    alert['filename'] = path
+                    alert['change_type'] = 'added'
+                    vulnerabilities.append(alert)
+
+        return {
+            "repository": repo_url,
+            "base": base.hexsha,
+            "head": head.hexsha,
+            "files_analyzed": files_analyzed,
+            "lines_analyzed": lines_analyzed,
+            "vulnerabilities": vulnerabilities,
+            "stats": stats.as_dict(),
+            "summary": f"Found {len(vulnerabilities)} potential vulnerabilities in {files_analyzed} changed files."
+        }
+
+    def _changed_hunks(self, base, head) -> List[Tuple[str, str, List[Tuple[int, int]]]]:
+        """
+        Lists changed code files between two commits as (path, head blob SHA, ranges),
+        where ranges are the 1-based inclusive head-side line ranges of each hunk.
+        Deleted files and pure deletions carry no head lines and are skipped.
+        """
+        changes = []
+        for diff in base.diff(head, create_patch=True, unified=0, M=True):
+            if diff.b_blob is None or not self._is_code_file(os.path.basename(diff.b_path)):
+                continue
+
+            patch = diff.diff.decode('utf-8', errors='ignore') if isinstance(diff.diff, bytes) else diff.diff
+            ranges = []
+            for match in HUNK_HEADER.finditer(patch):
+                start = int(match.group(1))
+                count = int(match.group(2)) if match.group(2) is not None else 1
+                if count > 0:
+                    ranges.append((start, start + count - 1))
+
+            if ranges:
+                changes.append((diff.b_path, diff.b_blob.hexsha, ranges))
+        return sorted(changes)
+
+    def scan_tree(self, repo: Repo, ref: str = "HEAD", workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Scans every code file of `repo` at `ref`, reading blobs from the object database.
+        Unchanged blobs are served from the result cache (keyed by blob SHA).
+        """
+        return list(self.iter_scan_tree(repo, ref=ref, workers=workers))
+
+    def iter_scan_tree(self, repo: Repo, ref: str = "HEAD", workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Streaming `scan_tree`."""
+        stats = ScanStats()
+        blobs = self._collect_blobs(repo, ref, stats)
+        return self._iter_alerts(self._iter_cached_results(blobs, workers, repo=repo, stats=stats), stats)
+
+    def scan_directory(self, root: str, workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Scans every code file under `root`.
+
+        Args:
+            root: Directory to walk. Directories and files matched by the default excludes
+                  or by `.gitignore` / `.redeyeignore` files are pruned (see src/path_filter.py).
+            workers: Process pool size. None -> settings.SAST_WORKERS, 0 -> all available cores,
+                     1 -> scan sequentially in this process.
+
+        Output order is deterministic (sorted walk order) regardless of `workers`.
+        """
+        stats = ScanStats()
+        files = self._collect_files(root, stats)
+        return list(self._iter_alerts(self._iter_results(files, workers, stats=stats), stats))
+
+    def _iter_alerts(self, results: Iterator[IngestResult], stats: ScanStats) -> Iterator[Dict[str, Any]]:
+        """
+        Flattens per-file results into a stream of alerts and records `last_scan_stats`
+        (also when the consumer stops early; the stats then cover the files seen so far).
+        """
+        try:
+            for file_alerts, outcome, size in results:
+                stats.record(outcome, size)
+                yield from file_alerts
+        finally:
+            results.close()
+            self.last_scan_stats = stats.as_dict()
+            print(f"📊 [SAST] Stats: {self.last_scan_stats}")
+
+    def _collect_blobs(self, repo: Repo, ref: str, stats: ScanStats) -> List[Tuple[str, str]]:
+        """
+        Lists the code files of the tree at `ref` as sorted (blob_sha, path) pairs.
+        Ignored subtrees are pruned without being traversed. Every blob here is tracked,
+        so `.gitignore` does not apply (only the defaults and `.redeyeignore`).
+        """
+        blobs = []
+        pending = [(repo.commit(ref).tree, PathFilter.default())]
+        while pending:
+            tree, parent_filter = pending.pop()
+            path_filter = parent_filter.extend(tree.path, lambda name: read_tree_file(tree, name), TRACKED_IGNORE_FILES)
+
+            for subtree in tree.trees:
+                if path_filter.is_ignored(subtree.path, is_dir=True):
+                    stats.dirs_pruned += 1
+                else:
+                    pending.append((subtree, path_filter))
+
+            for blob in tree.blobs:
+                if not self._is_code_file(blob.name):
+                    continue
+                if path_filter.is_ignored(blob.path):
+                    stats.record(IGNORED, blob.size)
+                else:
+                    blobs.append((blob.hexsha, blob.path))
+        return sorted(blobs, key=lambda blob: blob[1])
+
+    def _collect_files(self, root: str, stats: ScanStats) -> List[str]:
+        """Walks `root` in sorted order and returns the code files to scan (ignored dirs are pruned)."""
+        paths = []
+        filters = {root: PathFilter.default()}
+        for current, dirs, files in os.walk(root):
+            rel = os.path.relpath(current, root).replace(os.sep, "/")
+            rel = "" if rel == "." else rel
+            path_filter = filters.pop(current).extend(rel, lambda name: _read_text(os.path.join(current, name)))
+
+            kept = []
+            for name in sorted(dirs):
+                if path_filter.is_ignored(f"{rel}/{name}".lstrip("/"), is_dir=True):
+                    stats.dirs_pruned += 1
+                else:
+                    kept.append(name)
+                    filters[os.path.join(current, name)] = path_filter
+            dirs[:] = kept  # Prune in place so os.walk never descends into ignored dirs
+
+            for file in sorted(files):
+                # Skip binary or non-code files
+                if not self._is_code_file(file):
+                    continue
+                file_path = os.path.join(current, file)
+                if path_filter.is_ignored(f"{rel}/{file}".lstrip("/")):
+                    stats.record(IGNORED, os.path.getsize(file_path))
+                else:
+                    paths.append(file_path)
+        return paths
+
+    def _resolve_workers(self, workers: Optional[int]) -> int:
+        if workers is None:
+            workers = settings.SAST_WORKERS
+        if workers <= 0:
+            # Respect CPU affinity / container limits where the platform exposes them
+            workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        return workers
+
+    def _iter_cached_results(
+        self,
+        items: List[Tuple[str, str]],
+        workers: Optional[int] = None,
+        repo: Optional[Repo] = None,
+        stats: Optional[ScanStats] = None
+    ) -> Iterator[IngestResult]:
+        """
+        Same contract as `_iter_results` for `(blob_sha, path)` items, but serves
+        unchanged blobs from the result cache and only scans the misses.
+        Fresh results are written back at the end (skipped/failed files are not cached).
+        """
+        cache = self.result_cache
+        if cache is None:
+            yield from self._iter_results(items, workers, repo=repo, stats=stats)
+            return
+
+        version = self.rule_engine.version
+        keys = [cache.make_key(version, blob_sha, os.path.basename(path)) for blob_sha, path in items]
+        cached = cache.get_many(keys)
+        misses = [item for item, key in zip(items, keys) if key not in cached]
+        print(f"♻️ [SAST] Cache: {len(items) - len(misses)} hits / {len(misses)} misses")
+
+        fresh = {}
+        scanned = self._iter_results(misses, workers, repo=repo, stats=stats)
+        try:
+            for key in keys:
+                if key in cached:
+                    yield cached[key], CACHED, 0
+                    continue
+                result = next(scanned)
+                if result[1] in (SCANNED, WINDOWED):
+                    fresh[key] = result[0]
+                yield result
         finally:
-            # Cleanup
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            print(f"🧹 [SAST] Verified & Cleaned up temp dir: {temp_dir}")
+            scanned.close()
+            cache.put_many(fresh)
+
+    def _iter_results(
+        self,
+        items: List[Any],
+        workers: Optional[int] = None,
+        repo: Optional[Repo] = None,
+        stats: Optional[ScanStats] = None
+    ) -> Iterator[IngestResult]:
+        """
+        Yields `(alerts, outcome, size)` for each item in `items` order, as soon as available.
+        An item is a file path on disk or a `(blob_sha, path)` pair read from `repo`.
 
-        return alerts
+        With more than one worker, items are split into chunks and scanned by a
+        ProcessPoolExecutor. The rule set is shipped once per worker (initializer),
+        and only a bounded window of chunks is in flight at a time. Each chunk's worker
+        peak RSS is recorded in `stats`.
+        """
+        workers = self._resolve_workers(workers)
+        if workers <= 1 or len(items) <= SCAN_CHUNK_SIZE:
+            engine = self.rule_engine
+            for item in items:
+                yield scan_item(engine, repo, item)
+            return
+
+        chunks = (items[i:i + SCAN_CHUNK_SIZE] for i in range(0, len(items), SCAN_CHUNK_SIZE))
+        # "spawn": forking a process that already runs uvicorn/torch threads is unsafe
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.vulnerability_patterns, repo.git_dir if repo is not None else None)
+        ) as executor:
+            pending = deque(executor.submit(scan_files, chunk) for chunk in islice(chunks, workers * 2))
+            try:
+                while pending:
+                    chunk_results, peak_rss = pending.popleft().result()
+                    if stats is not None:
+                        stats.record_worker_peak(peak_rss)
+                    next_chunk = next(chunks, None)
+                    if next_chunk is not None:
+                        pending.append(executor.submit(scan_files, next_chunk))
+                    yield from chunk_results
+            finally:
+                # Consumer stopped early: drop queued chunks instead of scanning them on shutdown
+                for future in pending:
+                    future.cancel()
 
     def _is_code_file(self, filename: str) -> bool:
         allowed_extensions = {'.py', '.js', '.ts', '.java', '.c', '.cpp', '.cs', '.go', '.rb', '.php', '.html', '.env'}
         return any(filename.endswith(ext) for ext in allowed_extensions)
 
+def limit_alerts(
+    alerts: Iterator[Dict[str, Any]],
+    max_alerts: Optional[int] = None,
+    min_risk: Optional[str] = None,
+    stop_on_risk: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Early-stop wrapper for alert streams. Closes `alerts` when done.
+
+    Args:
+        max_alerts: Stop after yielding this many alerts.
+        min_risk: Drop alerts below this risk ("Low" < "Medium" < "High").
+        stop_on_risk: Stop right after the first alert at or above this risk (fail fast).
+    """
+    min_level = RISK_LEVELS[min_risk] if min_risk else None
+    stop_level = RISK_LEVELS[stop_on_risk] if stop_on_risk else None
+    count = 0
+    try:
+        if max_alerts is not None and max_alerts <= 0:
+            return
+        for alert in alerts:
+            level = RISK_LEVELS.get(alert.get("risk"), 0)
+            if min_level is not None and level < min_level:
+                continue
+            yield alert
+            count += 1
+            if (max_alerts is not None and count >= max_alerts) or (stop_level is not None and level >= stop_level):
+                return
+    finally:
+        alerts.close()
+
+
+async def iterate_in_thread(
+    make_iter: Callable[[], Iterator[Any]],
+    buffer: int,
+    executor: Optional[concurrent.futures.Executor] = None
+) -> AsyncIterator[Any]:
+    """
+    Runs a blocking iterator in a worker thread and yields its items on the event loop.
+    The producer blocks once `buffer` items are waiting (backpressure); when the consumer
+    stops, the producer closes the iterator at its next item.
+    `executor`: thread pool for the producer (default: the loop's default executor).
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, buffer))
+    stopped = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=STREAM_POLL_SECONDS)
+                return True
+            except concurrent.futures.TimeoutError:
+                if stopped.is_set():
+                    future.cancel()
+                    return False
+
+    def produce():
+        iterator = make_iter()
+        try:
+            for item in iterator:
+                if stopped.is_set() or not put(item):
+                    break
+        except Exception as e:
+            put(e)
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+            if not stopped.is_set():
+                put(done)
+
+    producer = loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        if producer.done():
+            producer.result()
+
+
+def _read_text(path: str) -> Optional[str]:
+    """Content of a small text file on disk (None if absent / unreadable)."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+    except OSError:
+        return None
+
 repo_scanner = RepoScanner()
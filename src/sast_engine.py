@@ -0,0 +1,248 @@
+import re
+import json
+import hashlib
+from bisect import bisect_left
+from typing import List, Dict, Any, Optional, Set, Tuple, Iterator
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# Bump when the matching semantics change so cached results keyed by
+# `RuleEngine.version` are invalidated together with rule edits.
+ENGINE_REVISION = 1
+
+_LEADING_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+_NEWLINE = re.compile("\n")
+
+# Literals shorter than this hit almost every line and are not worth prefiltering on
+MIN_LITERAL_LENGTH = 3
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(sre_parse.POSSESSIVE_REPEAT)
+_GROUPS = {sre_parse.SUBPATTERN}
+if hasattr(sre_parse, "ATOMIC_GROUP"):
+    _GROUPS.add(sre_parse.ATOMIC_GROUP)
+
+
+def _scoped(pattern: str) -> str:
+    """
+    Rewrites a leading global inline flag group (e.g. `(?i)`) into a scoped one
+    (`(?i:...)`) so the pattern can be embedded in a larger alternation.
+    """
+    match = _LEADING_FLAGS.match(pattern)
+    if not match:
+        return f"(?:{pattern})"
+    return f"(?{match.group(1)}:{pattern[match.end():]})"
+
+
+def _best(candidates: List[Set[str]]) -> Optional[Set[str]]:
+    """Picks the most selective alternative set (longest shortest-literal, then fewest)."""
+    if not candidates:
+        return None
+    return max(candidates, key=lambda alts: (min(len(a) for a in alts), -len(alts)))
+
+
+def _required_from_sequence(items) -> Optional[Set[str]]:
+    """
+    Returns a set of case-folded literals of which at least one must appear in
+    any match of the parsed sequence, or None if nothing useful is required.
+    """
+    candidates = []
+    run = []
+
+    def flush():
+        if run:
+            candidates.append({"".join(run).casefold()})
+            run.clear()
+
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+
+        required = None
+        if op in _GROUPS:
+            body = av[-1] if op is sre_parse.SUBPATTERN else av
+            required = _required_from_sequence(body)
+        elif op is sre_parse.BRANCH:
+            alternatives = [_required_from_sequence(branch) for branch in av[1]]
+            if alternatives and all(alternatives):
+                required = set().union(*alternatives)
+        elif op in _REPEATS and av[0] >= 1:
+            required = _required_from_sequence(av[2])
+
+        if required:
+            candidates.append(required)
+    flush()
+
+    return _best(candidates)
+
+
+def derive_literals(pattern: str) -> Optional[List[str]]:
+    """
+    Derives the prefilter literals for a rule pattern.
+    A line can only match the rule if it contains (case-insensitively) one of them.
+    Returns None when no literal of at least MIN_LITERAL_LENGTH chars is required.
+    """
+    try:
+        required = _required_from_sequence(sre_parse.parse(pattern))
+    except Exception:
+        return None
+    if not required or min(len(lit) for lit in required) < MIN_LITERAL_LENGTH:
+        return None
+    return sorted(required)
+
+
+class RuleEngine:
+    """
+    Compiled SAST rule engine used by RepoScanner.
+
+    All rules are compiled once and merged into a single combined matcher that
+    runs over the whole file buffer in one pass. The combined matcher only finds
+    candidate lines; each candidate line is then checked against the individual
+    compiled rules so the alerts are identical to the old line-by-line scan
+    (one alert per matching (line, rule) pair, ordered by line then rule).
+
+    Literal Prefilter:
+    - Each rule may declare `literals` (list of strings); otherwise they are derived
+      from the pattern (e.g. "pickle.loads(" or SELECT/INSERT/UPDATE/DELETE).
+    - Case-insensitive substring search over the case-folded buffer (C-speed `str.find`)
+      selects the lines worth evaluating, so the rule regexes only run on those lines.
+    - Rules without usable literals fall back to the combined matcher.
+    """
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = [dict(rule) for rule in rules]
+        self.version = self.fingerprint(self.rules)
+        self._compiled = [re.compile(rule["pattern"]) for rule in self.rules]
+
+        # Prefilter literals per rule (None -> rule is always evaluated)
+        self.literals: List[Optional[List[str]]] = []
+        for rule in self.rules:
+            declared = rule.get("literals")
+            if declared:
+                self.literals.append(sorted({lit.casefold() for lit in declared}))
+            else:
+                self.literals.append(derive_literals(rule["pattern"]))
+
+        self._literal_rules = [i for i, lits in enumerate(self.literals) if lits]
+        self._fallback_rules = [i for i, lits in enumerate(self.literals) if not lits]
+
+        # literal -> rules requiring it
+        self._literal_owners: Dict[str, List[int]] = {}
+        for i in self._literal_rules:
+            for lit in self.literals[i]:
+                self._literal_owners.setdefault(lit, []).append(i)
+        self._combined = re.compile(
+            "|".join(_scoped(self.rules[i]["pattern"]) for i in self._fallback_rules),
+            re.MULTILINE
+        ) if self._fallback_rules else None
+
+    @staticmethod
+    def fingerprint(rules: List[Dict[str, Any]]) -> str:
+        """Stable hash of a rule set (changes whenever any rule changes)."""
+        payload = json.dumps([ENGINE_REVISION, rules], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def scan(
+        self,
+        content: str,
+        filename: str = "snippet",
+        line_ranges: Optional[List[Tuple[int, int]]] = None,
+        line_numbers: bool = False,
+        line_offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Scans a whole buffer and returns alert dicts in RepoScanner format.
+
+        Args:
+            line_ranges: Optional 1-based inclusive (first, last) line ranges. Rules are
+                         only evaluated on these lines (e.g. changed hunks of a diff).
+            line_numbers: Also add a 1-based "line_number" field to each alert.
+            line_offset: Added to reported line numbers when `content` is a window
+                         of a larger file.
+        """
+        return list(self.iter_scan(content, filename, line_ranges, line_numbers, line_offset))
+
+    def iter_scan(
+        self,
+        content: str,
+        filename: str = "snippet",
+        line_ranges: Optional[List[Tuple[int, int]]] = None,
+        line_numbers: bool = False,
+        line_offset: int = 0
+    ) -> Iterator[Dict[str, Any]]:
+        """Same as `scan`, yielding alerts in line order as they are confirmed."""
+        candidates = self._candidate_lines(content)
+        if line_ranges is not None:
+            wanted = {line for first, last in line_ranges for line in range(first - 1, last)}
+            candidates = {line_no: rules for line_no, rules in candidates.items() if line_no in wanted}
+        if not candidates:
+            return
+
+        lines = content.split('\n')
+        for line_no in sorted(candidates):
+            line = lines[line_no]
+            for i in sorted(candidates[line_no]):
+                if self._compiled[i].search(line):
+                    alert = self._build_alert(self.rules[i], lines, line_no, filename, line_offset)
+                    if line_numbers:
+                        alert["line_number"] = line_offset + line_no + 1
+                    yield alert
+
+    def _candidate_lines(self, content: str) -> Dict[int, Set[int]]:
+        """Maps line number -> indices of rules worth evaluating on that line."""
+        candidates: Dict[int, Set[int]] = {}
+
+        # 1. Literal prefilter (substring search over the case-folded buffer)
+        if self._literal_owners:
+            folded = content.casefold()
+            newline_index = [m.start() for m in _NEWLINE.finditer(folded)]
+            for literal, owners in self._literal_owners.items():
+                find = folded.find
+                pos = find(literal)
+                while pos != -1:
+                    line_no = bisect_left(newline_index, pos)
+                    candidates.setdefault(line_no, set()).update(owners)
+                    # One hit per line is enough: skip to the next line
+                    if line_no >= len(newline_index):
+                        break
+                    pos = find(literal, newline_index[line_no] + 1)
+
+        # 2. Combined matcher for rules without literals
+        if self._combined is not None:
+            newline_index = [m.start() for m in _NEWLINE.finditer(content)]
+            search = self._combined.search
+            pos = 0
+            while True:
+                match = search(content, pos)
+                if not match:
+                    break
+
+                line_no = bisect_left(newline_index, match.start())
+                candidates.setdefault(line_no, set()).update(self._fallback_rules)
+
+                # Resume on the next line: every fallback rule is evaluated for this one
+                if line_no >= len(newline_index):
+                    break
+                pos = newline_index[line_no] + 1
+
+        return candidates
+
+    @staticmethod
+    def _build_alert(rule: Dict[str, Any], lines: List[str], i: int, filename: str, line_offset: int = 0) -> Dict[str, Any]:
+        # Capture Context (+/- 2 lines)
+        start_line = max(0, i - 2)
+        end_line = min(len(lines), i + 3)
+        context_snippet = "\n".join(lines[start_line:end_line])
+
+        return {
+            "alert": rule["label"],
+            "risk": rule["risk"],
+            "description": rule["description"],
+            "other": f"File: {filename}:{line_offset+i+1}\nCode:\n{context_snippet}"[:500]
+        }
+
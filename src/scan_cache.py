@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable
+from src.config import settings
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH = 500
+
+
+class MongoCacheTier:
+    """
+    Optional shared cache tier stored in MongoDB (via `src.database`).
+    Entries expire through a TTL index on `updated_at`, which keeps the collection bounded.
+    Any failure disables the tier for the rest of the process instead of failing scans.
+    Values are stored under `field` (also used by the inference result cache).
+    """
+    def __init__(self, collection_name: str, ttl_days: int, field: str = "alerts"):
+        self.collection_name = collection_name
+        self.ttl_days = ttl_days
+        self.field = field
+        self.enabled = True
+        self._collection = None
+
+    def _get_collection(self):
+        if self._collection is None:
+            from src.database import db
+            collection = db.get_sync_collection(self.collection_name)
+            collection.create_index("updated_at", expireAfterSeconds=self.ttl_days * 86400)
+            self._collection = collection
+        return self._collection
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        if not self.enabled or not keys:
+            return {}
+        try:
+            docs = self._get_collection().find({"_id": {"$in": keys}}, {self.field: 1})
+            return {doc["_id"]: doc[self.field] for doc in docs}
+        except Exception as e:
+            print(f"⚠️ [SAST Cache] MongoDB tier disabled: {e}")
+            self.enabled = False
+            return {}
+
+    def put_many(self, entries: Dict[str, Any]):
+        if not self.enabled or not entries:
+            return
+        try:
+            from pymongo import UpdateOne
+            now = datetime.utcnow()
+            self._get_collection().bulk_write([
+                UpdateOne({"_id": key}, {"$set": {self.field: value, "updated_at": now}}, upsert=True)
+                for key, value in entries.items()
+            ], ordered=False)
+        except Exception as e:
+            print(f"⚠️ [SAST Cache] MongoDB tier disabled: {e}")
+            self.enabled = False
+
+
+class ScanResultCache:
+    """
+    Content-addressed cache of per-file SAST results.
+
+    Key: (rule-set version, git blob SHA, file name). The file name is part of the key
+    because it is embedded in the alert text. The rule-set version comes from
+    `RuleEngine.version`, so editing `vulnerability_patterns` invalidates every entry.
+
+    Tiers:
+    1. Local SQLite store with LRU eviction (bounded by `max_entries`).
+    2. Optional MongoDB tier (`remote`), shared between instances.
+       Remote hits are written back to the local tier.
+    """
+    def __init__(self, path: str, max_entries: int, remote: Optional[MongoCacheTier] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.remote = remote
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, alerts TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_used ON results (last_used)")
+        self._conn.commit()
+
+    @classmethod
+    def from_settings(cls) -> "ScanResultCache":
+        remote = None
+        if settings.SAST_CACHE_MONGO:
+            remote = MongoCacheTier(settings.SAST_CACHE_COLLECTION, settings.SAST_CACHE_MONGO_TTL_DAYS)
+        path = os.path.join(os.path.expanduser(settings.SAST_CACHE_DIR), "sast_results.sqlite3")
+        return cls(path, settings.SAST_CACHE_MAX_ENTRIES, remote=remote)
+
+    @staticmethod
+    def make_key(rule_version: str, blob_sha: str, filename: str) -> str:
+        return hashlib.sha256(f"{rule_version}\0{blob_sha}\0{filename}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Returns cached alerts for the keys that are present (local tier first)."""
+        keys = list(keys)
+        found: Dict[str, List[Dict[str, Any]]] = {}
+
+        with self._lock:
+            now = time.time()
+            for i in range(0, len(keys), _SQL_BATCH):
+                batch = keys[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, alerts FROM results WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, alerts in rows:
+                    found[key] = json.loads(alerts)
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE results SET last_used = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows]
+                    )
+            self._conn.commit()
+
+        if self.remote is not None:
+            missing = [key for key in keys if key not in found]
+            remote_found = self.remote.get_many(missing)
+            if remote_found:
+                self._put_local(remote_found)
+                found.update(remote_found)
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries: Dict[str, List[Dict[str, Any]]]):
+        """Stores per-file alerts in every tier."""
+        if not entries:
+            return
+        self._put_local(entries)
+        if self.remote is not None:
+            self.remote.put_many(entries)
+
+    def _put_local(self, entries: Dict[str, List[Dict[str, Any]]]):
+        with self._lock:
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (key, alerts, last_used) VALUES (?, ?, ?)",
+                [(key, json.dumps(alerts, ensure_ascii=False), now) for key, alerts in entries.items()]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """LRU eviction: drop the least recently used entries above `max_entries`."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
@@ -0,0 +1,120 @@
+import os
+import asyncio
+import functools
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceOverloaded(Exception):
+    """Raised when more than `max_pending` inference calls are queued (callers should return 503)."""
+
+
+class InferenceExecutor:
+    """
+    Dedicated, bounded thread pool for CPU-heavy model inference.
+
+    Keeps `expert_model.verify` / `repair` off the asyncio event loop so health checks,
+    polling and OAuth requests are served while a model runs. Threads (not processes)
+    share the loaded models; torch releases the GIL inside its kernels.
+
+    CPU budget: torch's intra-op pool is process-wide, so it is sized to
+    `torch_threads` (0 -> available cores // workers) to keep `workers` concurrent
+    calls from oversubscribing the cores.
+    """
+    def __init__(self, workers: int, torch_threads: int, max_pending: int):
+        self.workers = max(1, workers)
+        self.torch_threads = torch_threads
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # Stats
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _ensure_started(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._configure_torch()
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        return self._executor
+
+    def thread_budget(self) -> int:
+        """Intra-op threads per inference call (also used for ONNX Runtime sessions)."""
+        if self.torch_threads > 0:
+            return self.torch_threads
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        return max(1, cores // self.workers)
+
+    def _configure_torch(self):
+        threads = self.thread_budget()
+        try:
+            import torch
+            torch.set_num_threads(threads)
+            logger.info(f"🧵 Inference executor: {self.workers} workers x {threads} torch threads")
+        except ImportError:
+            pass
+        self.torch_threads = threads
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs `fn(*args, **kwargs)` on the inference pool and awaits its result."""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise InferenceOverloaded(f"Inference queue is full ({self.max_pending} pending)")
+
+        executor = self._ensure_started()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def stream(self, make_iter: Callable[[], Iterator[Any]], buffer: int = 64) -> AsyncIterator[Any]:
+        """
+        Runs a blocking iterator (e.g. `expert_model.iter_repair`) on the inference pool and
+        yields its items. When the consumer stops, the iterator is closed at its next item,
+        so an abandoned stream stops using CPU.
+        """
+        from src.repo_scanner import iterate_in_thread
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise InferenceOverloaded(f"Inference queue is full ({self.max_pending} pending)")
+
+        executor = self._ensure_started()
+        self.pending += 1
+        try:
+            async for item in iterate_in_thread(make_iter, buffer, executor=executor):
+                yield item
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "torch_threads": self.torch_threads,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+
+inference_executor = InferenceExecutor(
+    workers=settings.INFERENCE_WORKERS,
+    torch_threads=settings.INFERENCE_TORCH_THREADS,
+    max_pending=settings.INFERENCE_MAX_PENDING
+)
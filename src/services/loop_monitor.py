@@ -0,0 +1,60 @@
+import asyncio
+from collections import deque
+from typing import Any, Dict, Optional
+from src.config import settings
+
+
+class LoopLagMonitor:
+    """
+    Measures asyncio event-loop lag: a background task sleeps `interval_ms` and records
+    how late it wakes up. Sustained lag means something is blocking the loop
+    (e.g. synchronous model inference in an `async def` endpoint).
+    Keeps the last `window` samples for percentiles.
+    """
+    def __init__(self, interval_ms: float, window: int = 600):
+        self.interval = interval_ms / 1000
+        self.samples = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": len(ordered),
+            "last_ms": round(self.samples[-1] * 1000, 2) if self.samples else 0.0,
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(self.max_lag * 1000, 2)
+        }
+
+
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL_MS)
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.config import settings
+from src.services.inference_executor import inference_executor
+
+logger = logging.getLogger(__name__)
+
+
+class BatcherOverloaded(Exception):
+    """Raised by `MicroBatcher.submit` when the queue is full (callers should shed load, e.g. HTTP 503)."""
+
+
+class MicroBatcher:
+    """
+    Async dynamic micro-batcher in front of a batched, blocking inference function.
+
+    Concurrent `submit` calls are queued; a single background task collects up to
+    `max_batch` items, waiting at most `max_wait_ms` after the first one, runs
+    `handler(items)` once on the inference executor and resolves each caller's future.
+    Only one batch runs at a time, so concurrent requests no longer compete for the
+    same CPU cores. At most `max_queue` items may wait; beyond that `submit` raises
+    BatcherOverloaded instead of letting latency grow without bound.
+
+    `handler` must return one result per item, in order.
+    """
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], List[Any]],
+        max_batch: int,
+        max_wait_ms: float,
+        max_queue: int,
+        name: str = "batcher"
+    ):
+        self.handler = handler
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_queue = max_queue
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Stats
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            # A loop that died leaves callers queued behind it: fail them, do not orphan them
+            self._drain(RuntimeError(f"{self.name} batching loop stopped"))
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run(), name=f"{self.name}-loop")
+
+    def _drain(self, error: Optional[BaseException] = None):
+        """Fails every queued future (cancelled, or `error`)."""
+        if self._queue is None:
+            return
+        futures = []
+        while not self._queue.empty():
+            futures.append(self._queue.get_nowait()[1])
+        _fail(futures, error)
+
+    async def submit(self, item: Any) -> Any:
+        """Queues one item and waits for its result from the next batch."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise BatcherOverloaded(f"{self.name} queue is full ({self.max_queue} pending)")
+        return await future
+
+    async def _collect(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """
+        Waits for a first item, then gathers more until `max_batch` or the deadline.
+        Items go straight into `batch`, so `_run` can fail them if it is cancelled meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Anything that queued up meanwhile rides along (up to max_batch)
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run(self):
+        batch: List[Tuple[Any, asyncio.Future]] = []
+        try:
+            while True:
+                batch = []
+                await self._collect(batch)
+                # Callers that gave up (client disconnect / timeout) are not computed
+                batch = [(item, future) for item, future in batch if not future.done()]
+                if not batch:
+                    continue
+
+                try:
+                    results = await inference_executor.run(self.handler, [item for item, _ in batch])
+                    if len(results) != len(batch):
+                        raise RuntimeError(f"{self.name} handler returned {len(results)} results for {len(batch)} items")
+                except Exception as e:
+                    logger.error(f"{self.name} batch failed: {e}")
+                    _fail([future for _, future in batch], e)
+                    continue
+
+                self.batches += 1
+                self.items += len(batch)
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+        except asyncio.CancelledError:
+            _fail([future for _, future in batch])  # Stopped mid-batch
+            raise
+        except BaseException as e:
+            logger.error(f"{self.name} batching loop crashed: {e}")
+            _fail([future for _, future in batch], e)
+            raise
+
+    async def stop(self):
+        """Cancels the batching loop (pending callers get CancelledError)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._drain()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "rejected": self.rejected
+        }
+
+
+def _fail(futures: List[asyncio.Future], error: Optional[BaseException] = None):
+    """Cancels the pending futures, or fails them with `error`."""
+    for future in futures:
+        if future.done():
+            continue
+        try:
+            if error is None:
+                future.cancel()
+            else:
+                future.set_exception(error)
+        except RuntimeError:  # Future of an event loop that is already closed
+            pass
+
+
+def _verify_batch(snippets: List[str]) -> List[Dict[str, Any]]:
+    from src.services.model_registry import model_registry
+    return model_registry.invoke(
+        "verify_batch",
+        snippets,
+        batch_size=settings.VERIFY_BATCH_MAX_SIZE,
+        windowed=settings.VERIFY_WINDOWED
+    )
+
+
+verify_batcher = MicroBatcher(
+    _verify_batch,
+    max_batch=settings.VERIFY_BATCH_MAX_SIZE,
+    max_wait_ms=settings.VERIFY_BATCH_MAX_WAIT_MS,
+    max_queue=settings.VERIFY_BATCH_MAX_QUEUE,
+    name="verify"
+)
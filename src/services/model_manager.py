@@ -0,0 +1,303 @@
+import gc
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+MB = 1024**2  # Unit of MODEL_MEMORY_BUDGET_MB and of every *_mb figure reported here
+
+
+class ModelMemoryExceeded(Exception):
+    """Raised when a model cannot be loaded within the memory budget (nothing idle to evict)."""
+    evicted = 0  # Idle models unloaded before giving up
+
+
+def model_resident_bytes(model: Any) -> int:
+    """
+    Bytes held by a loaded model's tensors (parameters, buffers and the packed int8
+    weights of dynamically quantized layers). Tensors shared between keys (tied
+    embeddings) are counted once. ONNX Runtime models: size of their graph files.
+    """
+    state_dict = getattr(model, "state_dict", None)
+    if state_dict is None or not hasattr(model, "parameters"):
+        return _onnx_bytes(model)
+
+    seen = set()
+    total = 0
+
+    def add(value: Any):
+        nonlocal total
+        if isinstance(value, (tuple, list)):
+            for item in value:
+                add(item)
+        elif hasattr(value, "untyped_storage"):
+            storage = value.untyped_storage()
+            if storage.data_ptr() not in seen:
+                seen.add(storage.data_ptr())
+                total += storage.nbytes()
+
+    for value in state_dict().values():
+        add(value)
+    return total
+
+
+def _onnx_bytes(model: Any) -> int:
+    root = str(getattr(model, "model_save_dir", ""))
+    if not root or not os.path.isdir(root):
+        return 0
+    return sum(os.path.getsize(os.path.join(root, f)) for f in os.listdir(root) if f.endswith(".onnx"))
+
+
+def process_memory(pid: Any = "self") -> Dict[str, int]:
+    """
+    Memory of a process from /proc/<pid>/smaps_rollup, in bytes:
+    - rss: resident pages, including pages shared with other processes
+    - pss: shared pages divided among the processes sharing them
+    - uss: private pages only (what the process would free on exit)
+    With pre-forked workers (src/prefork.py) the model weights are shared copy-on-write,
+    so uss per worker stays far below rss. Empty dict where /proc is unavailable.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except (OSError, ValueError):
+        return {}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+
+class ModelManager:
+    """
+    Memory governor for lazily loaded models (ExpertModel).
+
+    Tracks each loaded model's resident bytes and last use:
+    - `admit(name)` before a load: evicts idle models (least recently used first) until
+      the model's last known size fits the budget, or raises ModelMemoryExceeded.
+    - `register(name, model, unload)` after a load: records the measured size; if it does
+      not fit even after evicting idle models, the model is unloaded again and refused.
+    - `use(name)`: context manager around inference; models in use are never evicted.
+    - A background task (`start`) unloads models idle for longer than `idle_ttl_seconds`.
+    - `pin(name, reason)`: a loaded model that must never be evicted (pre-fork preloads).
+
+    budget_bytes / idle_ttl_seconds of 0 disable the budget / idle eviction.
+    Load, unload, refusal and pressure events are logged and kept in `stats()`.
+    """
+    def __init__(self, budget_bytes: int, idle_ttl_seconds: float, check_interval_seconds: float):
+        self.budget_bytes = budget_bytes
+        self.idle_ttl = idle_ttl_seconds
+        self.check_interval = max(1.0, check_interval_seconds)
+        self._lock = threading.RLock()
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._known_bytes: Dict[str, int] = {}  # Last measured size, also after unload
+        self._in_use: Dict[str, int] = {}
+        self._pinned: Dict[str, str] = {}  # name -> reason
+        self._task: Optional[asyncio.Task] = None
+        self.events = deque(maxlen=100)
+
+        # Stats
+        self.loads = 0
+        self.unloads = 0
+        self.refused = 0
+
+    def _event(self, kind: str, name: str, **details):
+        self.events.append({"time": time.time(), "event": kind, "model": name, **details})
+        message = f"{kind} {name} " + " ".join(f"{k}={v}" for k, v in details.items())
+        if kind in ("refused", "pressure"):
+            print(f"⚠️ [Models] {message}")
+            logger.warning(message)
+        else:
+            print(f"📦 [Models] {message}")
+            logger.info(message)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(entry["bytes"] for entry in self._models.values())
+
+    def admit(self, name: str):
+        """Makes room for `name` (by its last known size) before it is loaded."""
+        evicted = 0
+        try:
+            with self._lock:
+                evicted = self._make_room(name, self._known_bytes.get(name, 0))
+        except ModelMemoryExceeded as e:
+            evicted = e.evicted
+            raise
+        finally:
+            self._collect(evicted)
+
+    def register(self, name: str, model: Any, unload: Callable[[], None]):
+        """Records a freshly loaded model; unloads it again if it cannot fit the budget."""
+        size = model_resident_bytes(model)
+        evicted = 0
+        try:
+            with self._lock:
+                self._known_bytes[name] = size
+                try:
+                    evicted = self._make_room(name, size)
+                except ModelMemoryExceeded as e:
+                    evicted = e.evicted + 1
+                    unload()
+                    raise
+                self._models[name] = {"bytes": size, "last_used": time.monotonic(), "unload": unload}
+                self.loads += 1
+                self._event("load", name, mb=round(size / MB, 1), resident_mb=round(self.resident_bytes / MB, 1))
+        finally:
+            self._collect(evicted)
+
+    def _make_room(self, name: str, size: int) -> int:
+        """Evicts idle models until `size` fits (call with the lock held); returns how many."""
+        if self.budget_bytes <= 0:
+            return 0
+        others = {key: entry for key, entry in self._models.items() if key != name}
+        needed = sum(entry["bytes"] for entry in others.values()) + size - self.budget_bytes
+        if needed <= 0:
+            return 0
+
+        self._event("pressure", name, needed_mb=round(needed / MB, 1), budget_mb=round(self.budget_bytes / MB, 1))
+        idle = sorted(
+            (key for key in others if not self._in_use.get(key) and key not in self._pinned),
+            key=lambda key: others[key]["last_used"]
+        )
+        evicted = 0
+        for key in idle:
+            if needed <= 0:
+                break
+            needed -= others[key]["bytes"]
+            evicted += self._evict(key, reason="memory")
+        if needed > 0:
+            self.refused += 1
+            self._event("refused", name, mb=round(size / MB, 1), over_budget_mb=round(needed / MB, 1))
+            error = ModelMemoryExceeded(
+                f"Loading {name} ({size / MB:.0f} MB) would exceed the model memory budget "
+                f"({self.budget_bytes / MB:.0f} MB); models in use or pinned cannot be evicted"
+            )
+            error.evicted = evicted
+            raise error
+        return evicted
+
+    def pin(self, name: str, reason: str) -> bool:
+        """Exempts a loaded model from idle and memory eviction; False if it is not loaded."""
+        with self._lock:
+            if name not in self._models:
+                return False
+            self._pinned[name] = reason
+        self._event("pin", name, reason=reason)
+        return True
+
+    def unload(self, name: str, reason: str = "manual") -> bool:
+        with self._lock:
+            unloaded = self._evict(name, reason)
+        self._collect(unloaded)
+        return bool(unloaded)
+
+    def _evict(self, name: str, reason: str) -> int:
+        """Drops a model's references (call with the lock held); the memory is freed by `_collect`."""
+        entry = self._models.pop(name, None)
+        if entry is None:
+            return 0
+        self._pinned.pop(name, None)
+        entry["unload"]()
+        self.unloads += 1
+        self._event("unload", name, reason=reason, mb=round(entry["bytes"] / MB, 1))
+        return 1
+
+    @staticmethod
+    def _collect(unloaded: int):
+        # A full collection with models loaded takes 10-100s of ms: never under the lock
+        if unloaded:
+            gc.collect()
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[None]:
+        """Marks `name` busy (not evictable) for the duration of an inference call."""
+        with self._lock:
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_use[name] -= 1
+                if name in self._models:
+                    self._models[name]["last_used"] = time.monotonic()
+
+    def evict_idle(self) -> int:
+        """Unloads models unused for longer than the idle TTL; returns how many."""
+        if self.idle_ttl <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                name for name, entry in self._models.items()
+                if not self._in_use.get(name) and name not in self._pinned and now - entry["last_used"] > self.idle_ttl
+            ]
+            for name in expired:
+                self._evict(name, reason="idle")
+        self._collect(len(expired))
+        return len(expired)
+
+    def start(self):
+        if self.idle_ttl > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run(), name="model-idle-evictor")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                # Unloading and gc.collect() would stall the event loop
+                await asyncio.to_thread(self.evict_idle)
+            except Exception as e:
+                logger.error(f"Idle model eviction failed: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            models = {
+                name: {
+                    "mb": round(entry["bytes"] / MB, 1),
+                    "idle_seconds": round(now - entry["last_used"], 1),
+                    "in_use": self._in_use.get(name, 0),
+                    "pinned": self._pinned.get(name)
+                }
+                for name, entry in self._models.items()
+            }
+        return {
+            "budget_mb": round(self.budget_bytes / MB, 1) if self.budget_bytes > 0 else None,
+            "idle_ttl_seconds": self.idle_ttl or None,
+            "resident_mb": round(self.resident_bytes / MB, 1),
+            "process": {"pid": os.getpid(), **{f"{k}_mb": round(v / MB, 1) for k, v in process_memory().items()}},
+            "models": models,
+            "loads": self.loads,
+            "unloads": self.unloads,
+            "refused": self.refused,
+            "recent_events": list(self.events)[-20:]
+        }
+
+
+model_manager = ModelManager(
+    budget_bytes=settings.MODEL_MEMORY_BUDGET_MB * MB,
+    idle_ttl_seconds=settings.MODEL_IDLE_TTL_SECONDS,
+    check_interval_seconds=settings.MODEL_IDLE_CHECK_SECONDS
+)
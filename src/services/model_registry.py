@@ -0,0 +1,350 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from src.config import settings
+from src.expert_model import ExpertModel, expert_model
+from src.services.inference_executor import inference_executor, InferenceOverloaded
+
+logger = logging.getLogger(__name__)
+
+# Version states
+LOADING, READY, ACTIVE, DRAINING, RETIRED, FAILED = "loading", "ready", "active", "draining", "retired", "failed"
+
+
+class RegistryError(Exception):
+    """Invalid registry operation (unknown version, version not ready, ...)."""
+
+
+class ModelPathNotAllowed(RegistryError):
+    """A staged model path is not in settings.MODEL_PATH_ALLOWLIST."""
+
+
+def path_allowed(path: str) -> bool:
+    """Exact allowlist entries (HF repo ids, local dirs); local entries ending in "/" also cover their subdirectories."""
+    for entry in settings.MODEL_PATH_ALLOWLIST:
+        if path == entry:
+            return True
+        if entry.endswith("/") and os.path.isdir(entry):
+            root = os.path.realpath(entry)
+            if os.path.realpath(path).startswith(root + os.sep):
+                return True
+    return False
+
+
+class ModelVersion:
+    """One deployed set of detection + repair weights (an ExpertModel) and its serving stats."""
+    def __init__(self, name: str, expert: ExpertModel, state: str, window: int = 500):
+        self.name = name
+        self.expert = expert
+        self.state = state
+        self.in_flight = 0
+        self.created_at = time.time()
+        self.error: Optional[str] = None
+
+        # Stats (per ExpertModel method)
+        self.latencies: Dict[str, deque] = {}
+        self.calls: Dict[str, int] = {}
+        self.errors = 0
+        self.window = window
+        self.shadow_compared = 0
+        self.shadow_agreed = 0
+
+    def record(self, method: str, seconds: float):
+        self.latencies.setdefault(method, deque(maxlen=self.window)).append(seconds)
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        latency = {}
+        for method, samples in self.latencies.items():
+            ordered = sorted(samples)
+            latency[method] = {
+                "calls": self.calls[method],
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 1)
+            }
+        return {
+            "state": self.state,
+            "backend": self.expert.backend,
+            "detection_backend": self.expert.detection_backend,
+            "detection_path": self.expert.detection_path,
+            "repair_path": self.expert.repair_path,
+            "in_flight": self.in_flight,
+            "errors": self.errors,
+            "latency": latency,
+            "shadow_agreement": round(self.shadow_agreed / self.shadow_compared, 3) if self.shadow_compared else None,
+            "shadow_compared": self.shadow_compared,
+            "error": self.error
+        }
+
+
+class ModelRegistry:
+    """
+    Multi-version model serving with zero-downtime rollout.
+
+    Lifecycle of a new version (e.g. the output of scripts/quantize_and_save.py):
+    1. `stage(name, detection_path, repair_path)`: loads and warms it up on the inference
+       executor in the background; traffic keeps going to the active version.
+       Staging again replaces the previous candidate (it simply stops receiving traffic).
+    2. `set_rollout(name, percent, shadow_percent)`: `percent` of requests are served by
+       the candidate; `shadow_percent` of the remaining ones are also mirrored to it in
+       the background (result discarded, agreement with the active version recorded).
+    3. `promote(name)`: atomic switch of the active version. The previous one drains:
+       it is released (models unloaded) once its in-flight requests have finished.
+
+    Requests go through `invoke` (sync, inference threads), `call` (async) or `iterate`
+    (generators, e.g. streaming repair); each records per-version latency.
+
+    `freeze(reason)` disables the lifecycle operations (pre-fork serving: every worker
+    has its own registry, so a change would only reach the worker that got the request).
+    """
+    def __init__(self, default: ExpertModel):
+        self._lock = threading.Lock()
+        self.versions: Dict[str, ModelVersion] = {default.name: ModelVersion(default.name, default, ACTIVE)}
+        self.active = default.name
+        self.candidate: Optional[str] = None
+        self.rollout_percent = 0.0
+        self.shadow_percent = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = set()  # Background staging tasks (strong references)
+        self.frozen: Optional[str] = None  # Why stage / rollout / promote / abort are disabled
+
+    def freeze(self, reason: str):
+        self.frozen = reason
+
+    def _check_mutable(self):
+        if self.frozen:
+            raise RegistryError(f"Model registry is read-only: {self.frozen}")
+
+    @property
+    def active_model(self) -> ExpertModel:
+        return self.versions[self.active].expert
+
+    def start(self):
+        """Binds the event loop used to schedule shadow requests from inference threads."""
+        self._loop = asyncio.get_running_loop()
+
+    # --- Routing ---
+
+    def _route(self) -> Tuple[ModelVersion, Optional[ModelVersion]]:
+        """(version serving this request, version receiving a shadow copy or None); acquires the first."""
+        with self._lock:
+            serving, shadow = self.versions[self.active], None
+            candidate = self.versions.get(self.candidate) if self.candidate else None
+            if candidate is not None and candidate.state == READY:
+                if random.random() * 100 < self.rollout_percent:
+                    serving = candidate
+                elif random.random() * 100 < self.shadow_percent:
+                    shadow = candidate
+            serving.in_flight += 1
+        return serving, shadow
+
+    def _acquire(self, name: str) -> Optional[ModelVersion]:
+        with self._lock:
+            version = self.versions.get(name)
+            if version is None or version.state not in (READY, ACTIVE):
+                return None
+            version.in_flight += 1
+            return version
+
+    def _release(self, version: ModelVersion):
+        with self._lock:
+            version.in_flight -= 1
+            drained = version.state == DRAINING and version.in_flight == 0
+            if drained:
+                version.state = RETIRED
+        if drained:
+            self._retire(version)
+
+    @contextmanager
+    def _serving(self, version: ModelVersion, method: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            version.errors += 1
+            raise
+        finally:
+            version.record(method, time.perf_counter() - start)
+            self._release(version)
+
+    def invoke(self, method: str, *args, **kwargs) -> Any:
+        """Runs `ExpertModel.<method>` on the routed version (blocking; call from an inference thread)."""
+        version, shadow = self._route()
+        with self._serving(version, method):
+            result = getattr(version.expert, method)(*args, **kwargs)
+        if shadow is not None and self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shadow(shadow.name, method, result, args, kwargs), self._loop)
+        return result
+
+    async def call(self, method: str, *args, **kwargs) -> Any:
+        """Async `invoke` on the inference executor."""
+        return await inference_executor.run(self.invoke, method, *args, **kwargs)
+
+    def iterate(self, method: str, *args, **kwargs) -> Iterator[Any]:
+        """Generator methods (`iter_repair`): the version stays in flight until the generator ends."""
+        version, _ = self._route()  # No shadow for streams
+        with self._serving(version, method):
+            yield from getattr(version.expert, method)(*args, **kwargs)
+
+    async def _shadow(self, name: str, method: str, primary: Any, args: tuple, kwargs: dict):
+        version = self._acquire(name)
+        if version is None:
+            return
+
+        def run():
+            with self._serving(version, method):
+                return getattr(version.expert, method)(*args, **kwargs)
+
+        try:
+            result = await inference_executor.run(run)
+        except InferenceOverloaded:
+            self._release(version)  # Never ran: shadow traffic is dropped first under load
+            return
+        except Exception as e:
+            logger.warning(f"Shadow {method} on {name} failed: {e}")
+            return
+        version.shadow_compared += 1
+        version.shadow_agreed += int(_same_output(primary, result))
+
+    # --- Lifecycle ---
+
+    def stage(
+        self,
+        name: str,
+        detection_path: Optional[str] = None,
+        repair_path: Optional[str] = None,
+        backend: Optional[str] = None,
+        detection_backend: Optional[str] = None
+    ) -> ModelVersion:
+        """
+        Registers a new version and starts loading + warming it up in the background
+        (call from the event loop). It becomes the rollout candidate once ready.
+        New paths must be in settings.MODEL_PATH_ALLOWLIST (ModelPathNotAllowed otherwise);
+        omitted ones reuse the active version's.
+        """
+        self._check_mutable()
+        for path in (detection_path, repair_path):
+            if path is not None and not path_allowed(path):
+                raise ModelPathNotAllowed(f"Model path {path!r} is not in MODEL_PATH_ALLOWLIST")
+        with self._lock:
+            if name in self.versions and self.versions[name].state not in (RETIRED, FAILED):
+                raise RegistryError(f"Version {name} already exists ({self.versions[name].state})")
+            active = self.versions[self.active].expert
+            expert = ExpertModel(
+                backend=backend or active.backend,
+                detection_path=detection_path or active.detection_path,
+                repair_path=repair_path or active.repair_path,
+                name=name,
+                cache=active.cache,  # Keys include the weights fingerprint, so versions never collide
+                detection_backend=detection_backend or (None if backend else active.detection_backend)
+            )
+            version = ModelVersion(name, expert, LOADING)
+            self.versions[name] = version
+        print(f"📦 [Registry] Staging {name} (detection={expert.detection_path}, repair={expert.repair_path})")
+        task = asyncio.create_task(self._load(version), name=f"stage-{name}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return version
+
+    async def _load(self, version: ModelVersion):
+        name, expert = version.name, version.expert
+        try:
+            await inference_executor.run(expert.warm_up)
+        except Exception as e:
+            expert.load_error = str(e)
+        replaced = None
+        with self._lock:
+            if not expert.warmed_up:
+                version.state, version.error = FAILED, expert.load_error
+            else:
+                version.state = READY
+                if self.candidate not in (None, name):
+                    replaced = self.candidate
+                self.candidate, self.rollout_percent, self.shadow_percent = name, 0.0, 0.0
+        if version.state == FAILED:
+            print(f"❌ [Registry] {name} failed to load: {version.error}")
+            expert.release()
+            return
+        print(f"✅ [Registry] {name} is ready (candidate, 0% traffic)")
+        if replaced is not None and self.versions[replaced].state == READY:
+            self.abort(replaced)
+
+    def set_rollout(self, name: str, percent: float, shadow_percent: float = 0.0):
+        self._check_mutable()
+        with self._lock:
+            version = self.versions.get(name)
+            if version is None or version.state != READY:
+                raise RegistryError(f"Version {name} is not a ready candidate")
+            self.candidate = name
+            self.rollout_percent = min(100.0, max(0.0, percent))
+            self.shadow_percent = min(100.0, max(0.0, shadow_percent))
+        logger.info(f"Rollout {name}: {self.rollout_percent}% served, {self.shadow_percent}% shadowed")
+
+    def promote(self, name: str):
+        """Atomically makes `name` the active version; the previous one drains and is released."""
+        self._check_mutable()
+        with self._lock:
+            version = self.versions.get(name)
+            if version is None or version.state != READY:
+                raise RegistryError(f"Version {name} is not ready")
+            previous = self.versions[self.active]
+            version.state = ACTIVE
+            self.active = name
+            if self.candidate == name:
+                self.candidate, self.rollout_percent, self.shadow_percent = None, 0.0, 0.0
+            previous.state = DRAINING
+            drained = previous.in_flight == 0
+            if drained:
+                previous.state = RETIRED
+        print(f"🔁 [Registry] {name} is now active ({previous.name} draining)")
+        if drained:
+            self._retire(previous)
+
+    def abort(self, name: str):
+        """Drops a staged candidate (no traffic is sent to it anymore)."""
+        self._check_mutable()
+        with self._lock:
+            version = self.versions.get(name)
+            if version is None or version.state != READY:
+                raise RegistryError(f"Version {name} is not a staged candidate")
+            if self.candidate == name:
+                self.candidate, self.rollout_percent, self.shadow_percent = None, 0.0, 0.0
+            version.state = DRAINING
+            drained = version.in_flight == 0
+            if drained:
+                version.state = RETIRED
+        if drained:
+            self._retire(version)
+
+    def _retire(self, version: ModelVersion):
+        version.expert.release()
+        print(f"🗑️ [Registry] {version.name} released")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "frozen": self.frozen,
+            "candidate": self.candidate,
+            "rollout_percent": self.rollout_percent,
+            "shadow_percent": self.shadow_percent,
+            "versions": {name: version.stats() for name, version in self.versions.items()}
+        }
+
+
+def _same_output(primary: Any, shadow: Any) -> bool:
+    """Shadow agreement: same labels (verify) / same fixes (repair)."""
+    if isinstance(primary, list) and isinstance(shadow, list):
+        return len(primary) == len(shadow) and all(_same_output(a, b) for a, b in zip(primary, shadow))
+    if isinstance(primary, dict) and isinstance(shadow, dict):
+        field = "label" if "label" in primary else "fixed_code"
+        return primary.get(field) == shadow.get(field)
+    return primary == shadow
+
+
+model_registry = ModelRegistry(expert_model)
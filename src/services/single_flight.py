@@ -0,0 +1,63 @@
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Request coalescing for identical in-flight work (webhook retries, several users
+    scanning the same PR).
+
+    The first `do(key, fn)` call for a key starts `fn()` as a task; concurrent calls with
+    the same key await that task instead of starting their own, and every caller gets
+    the same result (or exception). The key is forgotten as soon as the task finishes,
+    so this is not a cache: a later request computes again.
+
+    The shared task is shielded from its callers: a caller that disconnects does not
+    cancel the computation the others are waiting for.
+    """
+    def __init__(self, name: str = "single-flight"):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        # Stats
+        self.started = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Stable content key for JSON-serializable request parts."""
+        payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Every caller may have gone away: retrieve the exception so it is not reported as unhandled
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"{self.name} task failed: {task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced
+        }
+
+
+analysis_flight = SingleFlight("analysis")
@@ -0,0 +1,99 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from transformers import AutoTokenizer
+
+logger = logging.getLogger(__name__)
+
+# (token ids without special tokens, character offsets per token or None)
+Encoding = Tuple[List[int], Optional[List[Tuple[int, int]]]]
+
+
+def load_fast_tokenizer(name_or_path: str, hf_token: Optional[str] = None) -> Any:
+    """The Rust ("fast") tokenizer of a model; warns if only a slow one exists."""
+    tokenizer = AutoTokenizer.from_pretrained(name_or_path, token=hf_token, use_fast=True)
+    if not tokenizer.is_fast:
+        logger.warning(f"⚠️ No fast tokenizer for {name_or_path}; batch encoding and offsets will be slow")
+    return tokenizer
+
+
+class CachedTokenizer:
+    """
+    Tokenization layer of one model: batch encoding with an LRU of encodings.
+
+    Entries hold the token ids *without* special tokens (plus character offsets with a
+    fast tokenizer), keyed by a hash of the text. Everything a model needs is derived
+    from them without re-tokenizing:
+    - `token_counts`: full lengths up front (routing long inputs to the windowed path)
+    - `model_inputs`: truncated ids with special tokens, identical to
+      tokenizer(text, truncation=True, max_length=...)
+    - the raw encodings (detection windows slice ids and map offsets to lines)
+
+    Repeated hunks (re-scans, retries, count-then-verify) are tokenized once.
+    """
+    def __init__(self, tokenizer: Any, max_entries: int):
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self.num_special = tokenizer.num_special_tokens_to_add()
+        self._entries: "OrderedDict[bytes, Encoding]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+
+    def encode_batch(self, texts: List[str]) -> List[Encoding]:
+        """Encodings of `texts`, in order; cache misses are tokenized in one batch call."""
+        keys = [self._key(text) for text in texts]
+        found: Dict[bytes, Encoding] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+                    self.hits += 1
+
+        missing = list({key: text for key, text in zip(keys, texts) if key not in found}.items())
+        if missing:
+            self.misses += len(missing)
+            fast = self.tokenizer.is_fast
+            encoded = self.tokenizer(
+                [text for _, text in missing],
+                add_special_tokens=False,
+                return_offsets_mapping=fast,
+                verbose=False
+            )
+            with self._lock:
+                for row, (key, _) in enumerate(missing):
+                    offsets = [tuple(pair) for pair in encoded["offset_mapping"][row]] if fast else None
+                    found[key] = (encoded["input_ids"][row], offsets)
+                    self._entries[key] = found[key]
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return [found[key] for key in keys]
+
+    def token_counts(self, texts: List[str]) -> List[int]:
+        """Untruncated model input lengths (special tokens included)."""
+        return [len(ids) + self.num_special for ids, _ in self.encode_batch(texts)]
+
+    def model_input(self, encoding: Encoding, max_length: int) -> Dict[str, List[int]]:
+        ids = self.tokenizer.build_inputs_with_special_tokens(encoding[0][:max_length - self.num_special])
+        return {"input_ids": ids, "attention_mask": [1] * len(ids)}
+
+    def model_inputs(self, texts: List[str], max_length: int) -> List[Dict[str, List[int]]]:
+        return [self.model_input(encoding, max_length) for encoding in self.encode_batch(texts)]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "fast": self.tokenizer.is_fast,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self._entries)
+        }
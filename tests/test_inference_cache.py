@@ -0,0 +1,39 @@
+import pytest
+
+from src.inference_cache import InferenceCache, normalize_code
+
+VERSION = "torch:abc123"
+
+
+@pytest.mark.parametrize("a, b", [
+    # `//` is floor division in Python, not a comment
+    ('n = len(x) // 2; eval(request.args["q"])', "n = len(x) // 2"),
+    # `#` is not a comment in C / JS
+    ("#include <stdio.h>\nint main() { system(cmd); }", "#include <stdio.h>\nint main() { }"),
+    ("const a = b # c;", "const a = b;"),
+    ("x = a /* b */ + c", "x = a + c"),
+    # Whitespace inside string literals is significant
+    ("q = 'SELECT  *'", "q = 'SELECT *'"),
+    ('s = """a\n\nb"""', 's = """a\nb"""'),
+    # Leading indentation is significant
+    ("if x:\n    y()\nz()", "if x:\n    y()\n    z()"),
+])
+def test_different_code_never_collides(a, b):
+    assert normalize_code(a) != normalize_code(b)
+    assert InferenceCache.make_key("verify", VERSION, a) != InferenceCache.make_key("verify", VERSION, b)
+    assert InferenceCache.make_key("repair", VERSION, a) != InferenceCache.make_key("repair", VERSION, b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("x = f(a,  b)   \n\n\ny = 1", "x = f(a, b)\ny = 1"),
+    ("if x:\n    y()\t\n", "if x:\n    y()"),
+])
+def test_formatting_only_changes_share_a_key(a, b):
+    assert InferenceCache.make_key("verify", VERSION, a) == InferenceCache.make_key("verify", VERSION, b)
+
+
+def test_key_includes_model_version_and_params():
+    code = "eval(x)"
+    assert InferenceCache.make_key("repair", VERSION, code, profile="fast") != \
+        InferenceCache.make_key("repair", VERSION, code, profile="balanced")
+    assert InferenceCache.make_key("repair", VERSION, code) != InferenceCache.make_key("repair", "torch:def456", code)